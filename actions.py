@@ -1,3 +1,4 @@
+from functools import cached_property
 from d6_rules import roll_d6_check, COMBAT_SKILLS, OPPOSED_SKILLS, roll_d6_dice
 from classes import GameState, InventoryItem
 
@@ -12,139 +13,114 @@ def get_equipped_weapon(actor, skill_name, game_state: GameState):
                 return item_details
     return None
 
-def execute_skill_check(actor, skill: str, target: str, game_state: GameState):
+class _TargetResolver:
     """
-    Performs a general skill check against a target.
-    This function now uses the game_state object to access the environment and actors.
+    Resolves the possible targets of a skill check on first access only,
+    then remembers the answer for the rest of the call.
     """
-    if not skill or not target:
-        return f"ERROR: Skill '{skill}' or target '{target}' not specified for skill check."
+    def __init__(self, actor, target_lower: str, game_state: GameState):
+        self._actor = actor
+        self._target_lower = target_lower
+        self._game_state = game_state
 
-    skill_lower = skill.lower()
-    target_lower = target.lower()
+    @cached_property
+    def object(self):
+        return self._game_state.environment.get_object_in_room(self._actor.location['room_id'], self._target_lower)
 
-    target_object = game_state.environment.get_object_in_room(actor.location['room_id'], target_lower)
-    target_door = next((d for d in game_state.environment.doors.values() if d['name'].lower() == target_lower), None)
-    target_trap = game_state.environment.get_trap_in_room(actor.location['room_id'], actor.location['zone'])
-    target_actor = game_state.find_actor_by_name(target_lower)
+    @cached_property
+    def door(self):
+        return self._game_state.environment.get_door_by_name(self._target_lower)
 
-    match skill_lower:
-        case "melee":
-            target_entity = target_actor or target_object
-            if not target_entity:
-                return f"Cannot find '{target}' to attack."
+    @cached_property
+    def trap(self):
+        return self._game_state.environment.get_trap_in_room(self._actor.location['room_id'], self._actor.location['zone'])
 
-            if not actor.equipped_weapon or actor.equipped_weapon.skill.lower() != skill_lower:
-                return f"{actor.name} tries to attack but has no appropriate weapon equipped!"
-            
-            # Simply roll the skill!
-            actor_roll, _ = actor.skills.melee.roll()
+    @cached_property
+    def actor(self):
+        return self._game_state.find_actor_by_name(self._target_lower)
 
-            highest_opposition_roll = 0
-            if target_actor:
-                # The opposing roll is just as simple
-                target_dodge_roll, _ = target_actor.skills.dodge.roll()
-                target_melee_roll, _ = target_actor.skills.melee.roll() # For parrying
-                highest_opposition_roll = max(target_dodge_roll, target_melee_roll)
+def _melee_attack(actor, skill: str, target: str, targets: _TargetResolver, game_state: GameState):
+    """Opposed melee attack: the attacker's melee against the better of the target's dodge or parry."""
+    target_actor = targets.actor
+    target_entity = target_actor or targets.object
+    if not target_entity:
+        return f"Cannot find '{target}' to attack."
 
-            if actor_roll > highest_opposition_roll:
-                # Access weapon data directly from the actor
-                base_damage = actor.equipped_weapon.value
-                damage_dealt = base_damage + (actor_roll - highest_opposition_roll)
-                
-                target_dr = getattr(target_entity, 'dr', 0)
-                final_damage = max(0, damage_dealt - target_dr)
-                
-                damage_message = ""
-                if hasattr(target_entity, 'cur_hp'):
-                    current_hp = getattr(target_entity, 'cur_hp')
-                    new_hp = current_hp - final_damage
-                    setattr(target_entity, 'cur_hp', new_hp) 
-                    
-                    if new_hp <= 0:
-                        damage_message = f"{target_entity.name} is destroyed!"
-                    else:
-                        damage_message = f"{target_entity.name} now has {new_hp} HP."
-                else:
-                    damage_message = f"{target_entity.name} seems unaffected."
+    if not actor.equipped_weapon or actor.equipped_weapon.skill.lower() != skill.lower():
+        return f"{actor.name} tries to attack but has no appropriate weapon equipped!"
+    
+    # Simply roll the skill!
+    actor_roll, _ = actor.skills.melee.roll(rng=game_state.rng)
 
-                dr_message = f" (reduced by {target_dr} from armor)" if target_dr > 0 else ""
-                return (f"{actor.name}'s {skill} attack with {actor.equipped_weapon.name} hits {target_entity.name}! "
-                        f"It deals {final_damage} damage{dr_message}. {damage_message}")
-            else:
-                return f"{actor.name}'s {skill} attack misses {target_entity.name}."
-        
-        case "observation":
-            return
-        case "charisma":
-            return
-        case "athletics":
-            return
-        case "throwing":
-            return
-        case "fortitude":
-            return
-        case "strength":
-            return
-        case "acrobatics":
-            return
-        case "fly":
-            return
-        case "trickery":
-            return
-        case "stealth":
-            return
-        case "dodge":
-            return
-        case "missiles":
-            return
-        case "appraise":
-            return
-        case "linguistics":
-            return
-        case "spellcraft":
-            return
-        case "navigation":
-            return
-        case "technology":
-            return
-        case "law":
-            return
-        case "business":
-            return
-        case "cultures":
-            return
-        case "medicine":
-            return
-        case "survival":
-            return
-        case "willpower":
-            return
-        case "miracles":
-            return
-        case "artistry":
-            return
-        case "forgery":
-            return
-        case "gambling":
-            return
-        case "streetwise":
-            return
-        case "deception":
-            return
-        case "disguise":
-            return
-        case "husbandry":
-            return
-        case "intimidation":
-            return
-        case "psionics":
-            return
+    highest_opposition_roll = 0
+    if target_actor:
+        # The opposing roll is just as simple
+        target_dodge_roll, _ = target_actor.skills.dodge.roll(rng=game_state.rng)
+        target_melee_roll, _ = target_actor.skills.melee.roll(rng=game_state.rng) # For parrying
+        highest_opposition_roll = max(target_dodge_roll, target_melee_roll)
 
-        case _:
-            return f"The skill '{skill}' cannot be used in this way or is not yet implemented."
+    if actor_roll > highest_opposition_roll:
+        # Access weapon data directly from the actor
+        base_damage = actor.equipped_weapon.value
+        damage_dealt = base_damage + (actor_roll - highest_opposition_roll)
+        
+        target_dr = getattr(target_entity, 'dr', 0)
+        final_damage = max(0, damage_dealt - target_dr)
+        
+        damage_message = ""
+        if hasattr(target_entity, 'cur_hp'):
+            current_hp = getattr(target_entity, 'cur_hp')
+            new_hp = current_hp - final_damage
+            setattr(target_entity, 'cur_hp', new_hp) 
+            game_state.bump_world_version()
             
-    return f"Could not find target '{target}' for skill check."
+            if new_hp <= 0:
+                damage_message = f"{target_entity.name} is destroyed!"
+            else:
+                damage_message = f"{target_entity.name} now has {new_hp} HP."
+        else:
+            damage_message = f"{target_entity.name} seems unaffected."
+
+        dr_message = f" (reduced by {target_dr} from armor)" if target_dr > 0 else ""
+        return (f"{actor.name}'s {skill} attack with {actor.equipped_weapon.name} hits {target_entity.name}! "
+                f"It deals {final_damage} damage{dr_message}. {damage_message}")
+    else:
+        return f"{actor.name}'s {skill} attack misses {target_entity.name}."
+
+# Skills the game recognises but that have no mechanical effect yet.
+_UNIMPLEMENTED_SKILLS = [
+    "observation", "charisma", "athletics", "throwing", "fortitude", "strength", "acrobatics", "fly",
+    "trickery", "stealth", "dodge", "missiles", "appraise", "linguistics", "spellcraft", "navigation",
+    "technology", "law", "business", "cultures", "medicine", "survival", "willpower", "miracles",
+    "artistry", "forgery", "gambling", "streetwise", "deception", "disguise", "husbandry",
+    "intimidation", "psionics",
+]
+
+# Skill name -> handler(actor, skill, target, targets, game_state). None means "no effect yet".
+SKILL_HANDLERS = {
+    "melee": _melee_attack,
+    **{skill_name: None for skill_name in _UNIMPLEMENTED_SKILLS},
+}
+
+def execute_skill_check(actor, skill: str, target: str, game_state: GameState):
+    """
+    Performs a general skill check against a target.
+    This function now uses the game_state object to access the environment and actors.
+    """
+    if not skill or not target:
+        return f"ERROR: Skill '{skill}' or target '{target}' not specified for skill check."
+
+    skill_lower = skill.lower()
+    if skill_lower not in SKILL_HANDLERS:
+        return f"The skill '{skill}' cannot be used in this way or is not yet implemented."
+
+    handler = SKILL_HANDLERS[skill_lower]
+    if handler is None:
+        return None
+
+    # Targets are only looked up when the handler actually asks for them.
+    targets = _TargetResolver(actor, target.lower(), game_state)
+    return handler(actor, skill, target, targets, game_state)
 
 def manage_item(actor, action: str, item_name: str, game_state: GameState, quantity: int = 1, target_name: str = None):
     """Manages item interactions like using, moving, creating, destroying, equipping, and unequipping."""
@@ -177,6 +153,7 @@ def manage_item(actor, action: str, item_name: str, game_state: GameState, quant
                         item.equipped = False
             # Equip the new item
             item_to_equip.equipped = True
+            game_state.bump_world_version()
             return f"{actor.name} equips the {item_name}."
 
         case 'unequip':
@@ -184,6 +161,7 @@ def manage_item(actor, action: str, item_name: str, game_state: GameState, quant
                 # FIX: Use attribute access
                 if item.item.lower() == item_name_lower and item.equipped:
                     item.equipped = False
+                    game_state.bump_world_version()
                     return f"{actor.name} unequips the {item_name}."
             return f"{actor.name} does not have a {item_name} equipped."
 
@@ -209,6 +187,7 @@ def manage_item(actor, action: str, item_name: str, game_state: GameState, quant
             if not hasattr(target, 'inventory'):
                 target.inventory = []
             target.inventory.append(item_to_move)
+            game_state.bump_world_version()
             return f"{actor.name} gives a {item_name} to {target.name}."
 
         case 'create':
@@ -221,6 +200,7 @@ def manage_item(actor, action: str, item_name: str, game_state: GameState, quant
                 # FIX: Append an actual InventoryItem object, not a dictionary
                 new_item = InventoryItem(item=item_details['name'], equipped=False, quantity=1)
                 actor.inventory.append(new_item)
+            game_state.bump_world_version()
             return f"Created {quantity} {item_name} and added it to {actor.name}'s inventory."
 
         case 'destroy':
@@ -235,6 +215,7 @@ def manage_item(actor, action: str, item_name: str, game_state: GameState, quant
                     inventory.pop(i)
                     items_removed += 1
             if items_removed > 0:
+                game_state.bump_world_version()
                 return f"Destroyed {items_removed} {item_name} from {actor.name}'s inventory."
             else:
                 return f"{actor.name} does not have any {item_name} to destroy."
@@ -289,7 +270,8 @@ def move_party(actor, destination_zone: str, game_state: GameState):
 
     new_location = {'room_id': actor.location['room_id'], 'zone': destination_zone}
     for member in party.members:
-        member.location = new_location
+        environment.move_actor(member, new_location)
+    game_state.bump_world_version()
 
     new_room, new_zone = environment.get_current_room_data(new_location)
     description = new_zone.get('description', 'You arrive in the new area.')
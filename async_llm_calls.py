@@ -0,0 +1,133 @@
+import asyncio
+import aiohttp
+from classes import GameState
+from classes import ActionHandler
+from llm_calls import (
+    _get_response_cache, _cached_response,
+    build_player_action_request, apply_player_action,
+    build_narration_request, apply_narration,
+    build_npc_action_request, apply_npc_action,
+)
+
+class AsyncLLMClient:
+    """
+    The asyncio counterpart of llm_calls.LLMClient: one pooled aiohttp session per
+    event loop (an aiohttp session only works on the loop it was made on), with retries and backoff on connection errors, timeouts, 429 and 5xx.
+    Cancelling the calling task cancels the request in flight.
+    """
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(self, url: str, headers: dict = None, pool_size: int = 10,
+                 max_retries: int = 3, backoff_factor: float = 0.5, timeout: float = 30):
+        self.url = url
+        self.headers = headers or {}
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.timeout = timeout
+        self._sessions = {} # Event loop -> its aiohttp session.
+
+    @classmethod
+    def from_config(cls, llm_config: dict):
+        """Builds a client from the same llm_config keys as LLMClient.from_config."""
+        return cls(
+            llm_config['url'],
+            headers=llm_config.get('headers'),
+            pool_size=llm_config.get('pool_size', 10),
+            max_retries=llm_config.get('max_retries', 3),
+            backoff_factor=llm_config.get('retry_backoff', 0.5),
+            timeout=llm_config.get('timeout', 30),
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # Created lazily so each session binds to the loop that actually uses it.
+        loop = asyncio.get_running_loop()
+        for other in [other for other in self._sessions if other.is_closed()]:
+            del self._sessions[other] # Its loop is gone; the session can't be used or awaited.
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            session = self._sessions[loop] = aiohttp.ClientSession(
+                headers=self.headers,
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+            )
+        return session
+
+    async def post(self, payload: dict, timeout: float = None) -> dict:
+        """Sends a chat completion request and returns the decoded JSON body."""
+        client_timeout = aiohttp.ClientTimeout(total=timeout or self.timeout)
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            try:
+                async with self._get_session().post(self.url, json=payload, timeout=client_timeout) as response:
+                    if response.status not in self.RETRY_STATUSES or last_attempt:
+                        return await response.json(content_type=None)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if last_attempt:
+                    raise
+            await asyncio.sleep(self.backoff_factor * (2 ** attempt))
+
+    async def close(self):
+        """Closes the session belonging to the running loop."""
+        session = self._sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None:
+            await session.close()
+
+def _get_async_client(llm_config: dict) -> AsyncLLMClient:
+    """Returns the config's shared async client, creating one on first use."""
+    client = llm_config.get('async_client')
+    if client is None:
+        client = llm_config['async_client'] = AsyncLLMClient.from_config(llm_config)
+    return client
+
+async def _async_request(llm_config: dict, prompt: str, payload: dict, timeout: float = None,
+                         cacheable: bool = False):
+    """Async version of llm_calls._request. Cancellation is never swallowed."""
+    try:
+        cache = _get_response_cache(llm_config) if cacheable else None
+        if cache is not None:
+            # The cache may hit SQLite, so it runs off the loop rather than stalling other coroutines.
+            key, response, tier = await asyncio.to_thread(_cached_response, cache, payload)
+            if response is not None:
+                return {"prompt": prompt, "response": response, "cache": tier}
+
+        response = await _get_async_client(llm_config).post(payload, timeout)
+
+        if cache is None:
+            return {"prompt": prompt, "response": response}
+        if "choices" in response:
+            await asyncio.to_thread(cache.put, key, response)
+        return {"prompt": prompt, "response": response, "cache": "miss"}
+    except Exception as e:
+        return {"prompt": prompt, "error": e}
+
+async def async_player_action(input_command: str, actor, game_state: GameState, action_handler: ActionHandler,
+                              llm_config: dict, timeout: float = None):
+    """Async version of llm_calls.player_action."""
+    prompt, payload = build_player_action_request(input_command, actor, game_state, llm_config)
+    plan = await _async_request(llm_config, prompt, payload, timeout, cacheable=True)
+    plan["input"] = input_command
+    return apply_player_action(actor, game_state, action_handler, plan)
+
+async def async_narration(actor, game_state: GameState, mechanical_summary: str, llm_config: dict,
+                          timeout: float = None):
+    """Async version of llm_calls.narration."""
+    prompt, payload = build_narration_request(actor, game_state, mechanical_summary, llm_config)
+    plan = await _async_request(llm_config, prompt, payload, timeout, cacheable=True)
+    return apply_narration(game_state, plan)
+
+async def async_plan_npc_action(actor, game_state: GameState, llm_config: dict, timeout: float = None):
+    """Async version of llm_calls.plan_npc_action; gather several of these to plan NPCs together."""
+    prompt, payload = build_npc_action_request(actor, game_state, llm_config)
+    return await _async_request(llm_config, prompt, payload, timeout)
+
+async def async_npc_action(actor, game_state: GameState, action_handler: ActionHandler, llm_config: dict,
+                           timeout: float = None):
+    """Async version of llm_calls.npc_action."""
+    plan = await async_plan_npc_action(actor, game_state, llm_config, timeout)
+    return apply_npc_action(actor, game_state, action_handler, plan)
@@ -0,0 +1,187 @@
+import argparse
+import random
+import re
+import timeit
+import numpy as np
+from d6_rules import roll_d6_dice, roll_d6_dice_many
+
+def _roll_d6_dice_per_die(pips_to_roll):
+    """The original list-of-randint roller, kept here as the baseline."""
+    pips_to_roll = max(0, int(pips_to_roll))
+    num_dice, pips_modifier = divmod(pips_to_roll, 3)
+    if num_dice <= 0:
+        return pips_modifier
+    return sum(random.randint(1, 6) for _ in range(num_dice)) + pips_modifier
+
+def bench_dice(args):
+    """Compares per-die rolling against the batched roller on the same pip pools."""
+    rng = np.random.default_rng(args.seed)
+    pips = rng.integers(0, args.max_pips + 1, size=args.rolls)
+    pips_list = pips.tolist()
+
+    per_die = min(timeit.repeat(lambda: [_roll_d6_dice_per_die(p) for p in pips_list], number=1, repeat=args.repeat))
+    scalar = min(timeit.repeat(lambda: [roll_d6_dice(p) for p in pips_list], number=1, repeat=args.repeat))
+    batched = min(timeit.repeat(lambda: roll_d6_dice_many(pips, rng), number=1, repeat=args.repeat))
+
+    print(f"{args.rolls} rolls, pools of 0-{args.max_pips} pips (best of {args.repeat})")
+    print(f"  per-die randint loop : {per_die * 1000:9.2f} ms")
+    print(f"  roll_d6_dice (scalar): {scalar * 1000:9.2f} ms  ({per_die / scalar:.1f}x per-die; the path every in-game roll takes)")
+    print(f"  roll_d6_dice_many    : {batched * 1000:9.2f} ms  ({per_die / batched:.0f}x per-die; combat_sim and other bulk rolls)")
+
+    # Sanity check that both rollers agree in distribution.
+    pool = np.full(args.rolls, args.max_pips)
+    old = np.array([_roll_d6_dice_per_die(args.max_pips) for _ in range(args.rolls)])
+    new = roll_d6_dice_many(pool, rng)
+    single = np.array([roll_d6_dice(args.max_pips, rng) for _ in range(args.rolls)])
+    print(f"  mean/std at {args.max_pips} pips: per-die {old.mean():.3f}/{old.std():.3f}, "
+          f"scalar {single.mean():.3f}/{single.std():.3f}, batched {new.mean():.3f}/{new.std():.3f}")
+
+PREFIX_REUSE_COMMANDS = [
+    "I look around the room.",
+    "I walk over to the nearest person and say hello.",
+    "I check the door for traps.",
+    "I wait and listen.",
+]
+
+def _approx_tokens(text):
+    """A rough stand-in for a model tokenizer: words and punctuation marks."""
+    return re.findall(r"\w+|[^\w\s]", text)
+
+def _common_prefix_length(a, b):
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return n
+
+def bench_prefix_reuse(args):
+    """
+    Plays a short game against the stub server and, for every request, counts how
+    many leading tokens match a request already sent. That is the part a server
+    with prefix caching (llama.cpp, vLLM) can serve from its KV cache.
+    """
+    from game_manager import GameManager
+    from llm_calls import LLMClient, _prompt_text
+    from llm_calls import PLAYER_ACTION_SYSTEM_PROMPT, NARRATION_SYSTEM_PROMPT, NPC_ACTION_SYSTEM_PROMPT
+    from llm_stub_server import StubLLMServer
+
+    with StubLLMServer() as server:
+        llm_config = {"url": server.url, "headers": {}, "model": "stub-model", "tools": []}
+        llm_config["client"] = LLMClient.from_config(llm_config)
+        game_manager = GameManager(llm_config)
+        game_manager.start_game()
+        for turn in range(args.turns):
+            game_manager.process_player_command(PREFIX_REUSE_COMMANDS[turn % len(PREFIX_REUSE_COMMANDS)])
+        llm_config["client"].close()
+        sent = list(server.requests)
+
+    labels = {PLAYER_ACTION_SYSTEM_PROMPT: "player_action", NARRATION_SYSTEM_PROMPT: "narration",
+              NPC_ACTION_SYSTEM_PROMPT: "npc_action"}
+    seen = []
+    total_tokens = total_reused = 0
+    print(f"{len(sent)} requests over {args.turns} player turns")
+    print(f"  {'#':>3}  {'type':<16} {'tokens':>7} {'reused':>7}")
+    for i, payload in enumerate(sent):
+        tokens = _approx_tokens(_prompt_text(payload["messages"]))
+        reused = max((_common_prefix_length(tokens, earlier) for earlier in seen), default=0)
+        seen.append(tokens)
+        total_tokens += len(tokens)
+        total_reused += reused
+        label = labels.get(payload["messages"][0]["content"], "?")
+        print(f"  {i:>3}  {label:<16} {len(tokens):>7} {reused:>7}  ({reused / len(tokens):.0%})")
+    print(f"  total: {total_reused} of {total_tokens} prompt tokens reusable ({total_reused / max(total_tokens, 1):.0%})")
+
+def _write_big_scenario(path, rooms):
+    """Writes a synthetic scenario with the given number of rooms, a few KB each."""
+    import yaml
+    scenario = {"scenario_name": "benchmark", "environment": {"rooms": [
+        {"room_id": f"room_{r}", "name": f"Room {r}", "description": "A plain stone room. " * 10,
+         "zones": [{"zone": z, "description": "A corner of the room. " * 5,
+                    "objects": [{"name": f"crate {r}-{z}-{o}", "description": "A wooden crate.",
+                                 "actions": [{"skill": "strength", "difficulty": 10, "pass": "It opens.", "fail": "Stuck."}]}
+                                for o in range(4)],
+                    "exits": [{"zone_ref": f"room_{r}_zone_{(z + 1) % 3}", "description": "A gap."}]}
+                   for z in range(3)]}
+        for r in range(rooms)]}}
+    with open(path, "w") as f:
+        yaml.safe_dump(scenario, f, sort_keys=False)
+
+def bench_scenario_load(args):
+    """Times loading a large scenario with the pure-Python loader, libyaml, and the pickle cache."""
+    import os
+    import tempfile
+    import yaml
+    import data_cache
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "big_scenario.yaml")
+        _write_big_scenario(path, args.rooms)
+        cache_dir = os.path.join(temp_dir, "cache")
+        print(f"{os.path.getsize(path) / 1e6:.1f} MB scenario, {args.rooms} rooms (best of {args.repeat})")
+
+        def timed(load):
+            return min(timeit.repeat(load, number=1, repeat=args.repeat))
+
+        def load_from_disk():
+            data_cache._memory.clear()
+            return data_cache.load_yaml_cached(path, cache_dir)
+
+        with open(path) as f:
+            text = f.read()
+        print(f"  yaml.safe_load (pure Python): {timed(lambda: yaml.load(text, Loader=yaml.SafeLoader)) * 1000:9.1f} ms")
+        if data_cache.SafeLoader is not yaml.SafeLoader:
+            print(f"  yaml CSafeLoader            : {timed(lambda: yaml.load(text, Loader=data_cache.SafeLoader)) * 1000:9.1f} ms")
+        load_from_disk() # Parses once and fills the cache.
+        print(f"  cached, from disk           : {timed(load_from_disk) * 1000:9.1f} ms")
+        print(f"  cached, in memory           : {timed(lambda: data_cache.load_yaml_cached(path, cache_dir)) * 1000:9.1f} ms")
+
+def bench_replay(args):
+    """
+    Records a game against the melee stub model, then replays it from its LLM log
+    (see replay.py) to time the engine alone, with no model or network involved.
+    """
+    from game_manager import GameManager
+    from llm_calls import TOOLS
+    from llm_stub_server import StubLLMClient, melee_responder
+    import replay
+
+    llm_config = {"url": None, "headers": {}, "model": "stub-model", "tools": TOOLS,
+                  "client": StubLLMClient(melee_responder(args.seed))}
+    game_manager = GameManager(llm_config, seed=args.seed)
+    game_manager.start_game()
+    for turn in range(args.turns):
+        game_manager.process_player_command(PREFIX_REUSE_COMMANDS[turn % len(PREFIX_REUSE_COMMANDS)])
+    entries = list(game_manager.game_state.llm_log)
+    expected = game_manager.capture_state()
+    seed = replay.seed_from_state(expected)
+
+    runs = [replay.replay_session(entries, seed=seed) for _ in range(args.repeat)]
+    mismatched = replay.compare_states(expected, runs[0][0].capture_state())
+    stats = [s for _, s in runs]
+    best = min(s["engine_seconds"] for s in stats)
+    print(f"{stats[0]['turns']} player turns, {stats[0]['llm_requests']} LLM requests replayed (best of {args.repeat})")
+    print(f"  unmatched prompts: {stats[0]['misses']}, state {'MISMATCH in ' + ', '.join(mismatched) if mismatched else 'matches'}")
+    print(f"  engine time: {best * 1000:.2f} ms, {best * 1000 / max(stats[0]['turns'], 1):.3f} ms per player turn")
+
+BENCHMARKS = {
+    "dice": bench_dice,
+    "prefix_reuse": bench_prefix_reuse,
+    "replay": bench_replay,
+    "scenario_load": bench_scenario_load,
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks for the game engine.")
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS))
+    parser.add_argument("--rolls", type=int, default=100_000)
+    parser.add_argument("--max-pips", type=int, default=15)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--turns", type=int, default=4, help="Player turns to play for prefix_reuse and replay.")
+    parser.add_argument("--rooms", type=int, default=1000, help="Rooms in the scenario_load test scenario.")
+    args = parser.parse_args()
+    BENCHMARKS[args.benchmark](args)
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,38 @@
 import collections
+import json
+import os
+import tempfile
+import threading
+import weakref
 from dataclasses import dataclass, field
 from typing import Dict, List, Any
-from d6_rules import roll_d6_check, D6_SKILLS_BY_ATTRIBUTE
+import numpy as np
+from d6_rules import roll_d6_check, SKILL_TO_ATTRIBUTE
 
 class Skill:
     """Represents a single, rollable skill belonging to an actor."""
     def __init__(self, name: str, pips: int, actor: 'Actor'):
         self.name = name
-        self.pips = pips
+        self._pips = pips
         self._actor = actor # A reference to the actor who owns the skill
 
+    @property
+    def pips(self) -> int:
+        return self._pips
+
+    @pips.setter
+    def pips(self, value: int):
+        self._pips = value
+        self._actor._pip_cache.pop(self.name, None)
+
     @property
     def total_pips(self) -> int:
         """Calculates the total pips by adding the base attribute."""
-        for attr, skill_list in D6_SKILLS_BY_ATTRIBUTE.items():
-            if self.name in skill_list:
-                # Adds skill pips to the governing attribute's pips
-                return self.pips + self._actor.attributes.get(attr, 0)
-        return self.pips # Return raw pips if no attribute is found
+        return self._actor.total_skill_pips(self)
 
-    def roll(self, dc: int = 0) -> tuple[int, bool]:
-        """Performs a d6 check for this skill."""
-        return roll_d6_check(self.total_pips, dc)
+    def roll(self, dc: int = 0, rng=None) -> tuple[int, bool]:
+        """Performs a d6 check for this skill, drawing from rng (usually GameState.rng) if given."""
+        return roll_d6_check(self.total_pips, dc, rng=rng)
 
     def __repr__(self):
         return f"Skill(name='{self.name}', pips={self.pips}, total={self.total_pips})"
@@ -52,6 +63,99 @@ class SkillHandler:
     def __repr__(self):
         return f"SkillHandler({list(self._skills.keys())})"
 
+class AttributeDict(dict):
+    """A dict of attribute pips that counts its own mutations, so derived totals can be cached."""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.version = 0
+
+    def __reduce__(self):
+        return (self.__class__, (dict(self),))
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.version += 1
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.version += 1
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self.version += 1
+
+    def setdefault(self, key, default=None):
+        self.version += 1
+        return super().setdefault(key, default)
+
+    def pop(self, *args):
+        self.version += 1
+        return super().pop(*args)
+
+    def popitem(self):
+        self.version += 1
+        return super().popitem()
+
+    def clear(self):
+        super().clear()
+        self.version += 1
+
+def _copy_nested(value):
+    """Copies the dicts and lists nested in value into plain ones; strings and numbers are immutable, so they stay shared."""
+    if isinstance(value, dict):
+        return {key: _copy_nested(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_copy_nested(item) for item in value]
+    return value
+
+class ReadOnlyDict(dict):
+    """A dict that refuses changes, for sheet data shared between actors. Replace it rather than edit it."""
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("Character sheet templates are read-only; change the actor's own sheet instead.")
+
+    __setitem__ = __delitem__ = __ior__ = update = setdefault = pop = popitem = clear = _read_only
+
+    def __reduce__(self):
+        return (self.__class__, (dict(self),))
+
+def _freeze_nested(value):
+    """Makes the dicts in value (however deeply nested) read-only, so shared sheet data can't be changed in place."""
+    if isinstance(value, dict):
+        return ReadOnlyDict({key: _freeze_nested(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return [_freeze_nested(item) for item in value]
+    return value
+
+class FrozenSheet(ReadOnlyDict):
+    """
+    A character sheet loaded once and shared by every actor spawned from it.
+    It can't be changed; instantiate() hands each actor its own sheet.
+    """
+    # Sheet entries that change during play, so each actor gets its own copy.
+    PER_ACTOR_FIELDS = ('attributes', 'inventory', 'statuses', 'memories', 'attitudes')
+
+    def __init__(self, sheet=()):
+        super().__init__({key: _freeze_nested(value) for key, value in dict(sheet).items()})
+
+    def instantiate(self) -> dict:
+        """
+        Returns a sheet for one actor. The entries that change in play
+        (PER_ACTOR_FIELDS) are the actor's own plain copies; the rest (skills,
+        qualities, personality, quotes...) are shared with the template and every
+        other actor spawned from it, and their dicts are read-only.
+        """
+        sheet = dict(self)
+        for key in self.PER_ACTOR_FIELDS:
+            if key in sheet:
+                sheet[key] = _copy_nested(sheet[key])
+        if sheet.get('memories') is None:
+            sheet['memories'] = []
+        return sheet
+
 @dataclass
 class ActiveEffect:
     """Represents an ongoing spell or condition on a character."""
@@ -98,71 +202,149 @@ class Environment:
         self.actors = []
         self.players = []
 
-        for room in self.rooms.values():
-            for obj_data in room.get('objects', []):
-                initial_hp = obj_data.get('hp', 0)
-                new_obj = Object(
-                    name=obj_data.get('name', 'Unknown Object'),
-                    description=obj_data.get('description', ''),
-                    location={'room_id': room['room_id'], 'zone': None},
-                    source_data=obj_data,
-                    is_interactive=obj_data.get('is_interactive', False),
-                    max_hp=initial_hp,
-                    cur_hp=initial_hp
-                )
-                self.objects.append(new_obj)
-            for zone_data in room.get('zones', []):
-                for obj_data in zone_data.get('objects', []):
-                    initial_hp = obj_data.get('hp', 0)
-                    new_obj = Object(
-                        name=obj_data.get('name', 'Unknown Object'),
-                        description=obj_data.get('description', ''),
-                        location={'room_id': room['room_id'], 'zone': zone_data.get('zone')},
-                        source_data=obj_data,
-                        is_interactive=obj_data.get('is_interactive', False),
-                        max_hp=initial_hp,
-                        cur_hp=initial_hp
-                    )
-                    self.objects.append(new_obj)
+        for obj_data, location in self.scenario_objects(self.rooms):
+            initial_hp = obj_data.get('hp', 0)
+            new_obj = Object(
+                name=obj_data.get('name', 'Unknown Object'),
+                description=obj_data.get('description', ''),
+                location=location,
+                source_data=obj_data,
+                is_interactive=obj_data.get('is_interactive', False),
+                max_hp=initial_hp,
+                cur_hp=initial_hp
+            )
+            self.objects.append(new_obj)
+
+        # The scenario's own objects, in load order. Saves refer to them by position (see save_format.py).
+        self.initial_objects = list(self.objects)
+
+        # Sheet path -> FrozenSheet, so a path shared by many actors is loaded once.
+        self._sheet_templates = {}
+        self._load_character_sheet = load_character_sheet_func
 
         for player_data in players_data:
-            sheet_path = player_data['sheet']
-            char_sheet = load_character_sheet_func(sheet_path)
-            if char_sheet:
-                if char_sheet.get('memories') is None:
-                    char_sheet['memories'] = []
-                
-                constructor_args = char_sheet.copy()
-                constructor_args.pop('skills', None)
-                
-                player_actor = Actor(
-                    **constructor_args, 
-                    location=player_data['location'], 
-                    source_data=char_sheet 
-                )
+            player_actor = self._spawn_actor(player_data)
+            if player_actor:
                 player_actor.is_player = True
                 self.players.append(player_actor)
             else:
-                print(f"Warning: Could not load player character sheet: {sheet_path}")
+                print(f"Warning: Could not load player character sheet: {player_data['sheet']}")
 
         for actor_data in actors_data:
-            sheet_path = actor_data['sheet']
-            char_sheet = load_character_sheet_func(sheet_path)
-            if char_sheet:
-                if char_sheet.get('memories') is None:
-                    char_sheet['memories'] = []
-
-                constructor_args = char_sheet.copy()
-                constructor_args.pop('skills', None)
-
-                new_actor = Actor(
-                    **constructor_args,
-                    location=actor_data['location'],
-                    source_data=char_sheet
-                )
+            new_actor = self._spawn_actor(actor_data)
+            if new_actor:
                 self.actors.append(new_actor)
             else:
-                print(f"Warning: Could not load actor character sheet: {sheet_path}")
+                print(f"Warning: Could not load actor character sheet: {actor_data['sheet']}")
+
+        self.rebuild_index()
+
+    def get_sheet_template(self, sheet_path):
+        """Returns the shared template for a character sheet, loading it on first use. None if it can't be loaded."""
+        if sheet_path not in self._sheet_templates:
+            char_sheet = self._load_character_sheet(sheet_path)
+            self._sheet_templates[sheet_path] = FrozenSheet(char_sheet) if char_sheet else None
+        return self._sheet_templates[sheet_path]
+
+    def _spawn_actor(self, spawn_data):
+        """Creates an actor from a scenario 'players'/'actors' entry, or None if its sheet can't be loaded."""
+        template = self.get_sheet_template(spawn_data['sheet'])
+        if template is None:
+            return None
+        char_sheet = template.instantiate()
+        constructor_args = char_sheet.copy()
+        constructor_args.pop('skills', None)
+        return Actor(**constructor_args, location=dict(spawn_data['location']), source_data=char_sheet,
+                     sheet_path=spawn_data['sheet'])
+
+    @staticmethod
+    def scenario_objects(rooms):
+        """Yields (object data, location) for each object a scenario's rooms place, room-level ones first."""
+        for room in rooms.values():
+            for obj_data in room.get('objects', []):
+                yield obj_data, {'room_id': room['room_id'], 'zone': None}
+            for zone_data in room.get('zones', []):
+                for obj_data in zone_data.get('objects', []):
+                    yield obj_data, {'room_id': room['room_id'], 'zone': zone_data.get('zone')}
+
+    @staticmethod
+    def object_state(obj):
+        """The parts of an Object that change during play, as plain data."""
+        return {"location": dict(obj.location), "cur_hp": obj.cur_hp, "max_hp": obj.max_hp,
+                "is_interactive": obj.is_interactive}
+
+    @staticmethod
+    def _zone_key(location):
+        return (location.get('room_id'), location.get('zone'))
+
+    def rebuild_index(self):
+        """
+        Rebuilds the (room_id, zone) and name lookups from scratch.
+        Call this after editing rooms, objects or actor locations directly.
+        """
+        self._objects_by_zone = {}
+        self._objects_by_name = {}
+        self._actors_by_zone = {}
+        self._traps_by_zone = {}
+        self._doors_by_name = {}
+
+        for door in self.doors.values():
+            self._doors_by_name.setdefault(door.get('name', '').lower(), door)
+        for obj in self.objects:
+            self._index_object(obj)
+        for actor in self.players + self.actors:
+            self._actors_by_zone.setdefault(self._zone_key(actor.location), []).append(actor)
+        for room_id, room in self.rooms.items():
+            for zone_data in room.get('zones', []):
+                if zone_data.get('trap'):
+                    self._traps_by_zone[(room_id, zone_data.get('zone'))] = zone_data['trap']
+
+    def _index_object(self, obj):
+        self._objects_by_zone.setdefault(self._zone_key(obj.location), []).append(obj)
+        self._objects_by_name.setdefault((obj.location['room_id'], obj.name.lower()), []).append(obj)
+
+    @staticmethod
+    def _remove_by_identity(items, target):
+        # Dataclass equality compares every field, so identical NPCs would match each other.
+        for i, item in enumerate(items):
+            if item is target:
+                del items[i]
+                return True
+        return False
+
+    def add_object(self, obj):
+        """Places a new Object in the world."""
+        self.objects.append(obj)
+        self._index_object(obj)
+
+    def remove_object(self, obj):
+        """Removes an Object from the world, e.g. once it has been destroyed."""
+        self._remove_by_identity(self.objects, obj)
+        self._remove_by_identity(self._objects_by_zone.get(self._zone_key(obj.location), []), obj)
+        name_key = (obj.location['room_id'], obj.name.lower())
+        self._remove_by_identity(self._objects_by_name.get(name_key, []), obj)
+        if not self._objects_by_name.get(name_key):
+            self._objects_by_name.pop(name_key, None)
+
+    def move_actor(self, actor, new_location):
+        """Relocates an actor, keeping the zone index in step."""
+        self._remove_by_identity(self._actors_by_zone.get(self._zone_key(actor.location), []), actor)
+        actor.location = new_location
+        self._actors_by_zone.setdefault(self._zone_key(new_location), []).append(actor)
+
+    def add_actor(self, actor):
+        """Adds a player or NPC to the world at its current location."""
+        (self.players if actor.is_player else self.actors).append(actor)
+        self._actors_by_zone.setdefault(self._zone_key(actor.location), []).append(actor)
+
+    def remove_actor(self, actor):
+        """Removes a player or NPC from the world."""
+        self._remove_by_identity(self.players if actor.is_player else self.actors, actor)
+        self._remove_by_identity(self._actors_by_zone.get(self._zone_key(actor.location), []), actor)
+
+    def get_actors_in_zone(self, room_id, zone_id):
+        """Returns a list of the players and NPCs standing in a specific zone."""
+        return list(self._actors_by_zone.get((room_id, zone_id), []))
 
     def get_room_by_id(self, room_id):
         return self.rooms.get(room_id)
@@ -170,6 +352,9 @@ class Environment:
     def get_door_by_id(self, door_id):
         return self.doors.get(door_id)
 
+    def get_door_by_name(self, door_name):
+        return self._doors_by_name.get(door_name.lower())
+
     def get_current_room_data(self, actor_location):
         room = self.get_room_by_id(actor_location['room_id'])
         if not room:
@@ -185,24 +370,16 @@ class Environment:
 
     def get_object_in_room(self, room_id, object_name):
         """Find an Object instance by name within a specific room."""
-        object_name_lower = object_name.lower()
-        for obj in self.objects:
-            if obj.location['room_id'] == room_id and obj.name.lower() == object_name_lower:
-                return obj
-        return None
+        matches = self._objects_by_name.get((room_id, object_name.lower()))
+        return matches[0] if matches else None
     
     def get_objects_in_zone(self, room_id, zone_id):
         """Returns a list of Object instances in a specific zone."""
-        return [obj for obj in self.objects if obj.location['room_id'] == room_id and obj.location['zone'] == zone_id]
+        return list(self._objects_by_zone.get((room_id, zone_id), []))
 
 
     def get_trap_in_room(self, room_id, zone_id):
-        room = self.get_room_by_id(room_id)
-        if room:
-            for zone_data in room.get('zones', []):
-                if zone_data.get('zone') == zone_id:
-                    return zone_data.get('trap')
-        return None
+        return self._traps_by_zone.get((room_id, zone_id))
 
     def get_item_details(self, item_name):
         return self.all_items.get(item_name.lower())
@@ -234,13 +411,45 @@ class Actor:
     
     description: str = ""
     quotes: List[str] = field(default_factory=list)
+    # The scenario sheet this actor was spawned from; saves store changes relative to it.
+    sheet_path: str = field(default=None, repr=False)
+
+    # Skill name -> total pips, valid while attributes is still _pip_cache_source at
+    # _pip_cache_version. Holding the dict itself means a replaced one can't be mistaken for it.
+    _pip_cache: Dict[str, int] = field(default_factory=dict, init=False, repr=False, compare=False)
+    _pip_cache_source: Any = field(default=None, init=False, repr=False, compare=False)
+    _pip_cache_version: int = field(default=0, init=False, repr=False, compare=False)
     
     def __post_init__(self):
         """Performs post-initialization setup."""
+        if not isinstance(self.attributes, AttributeDict):
+            self.attributes = AttributeDict(self.attributes or {})
         if self.inventory and isinstance(self.inventory[0], dict):
             self.inventory = [InventoryItem(**data) for data in self.inventory]
 
         self.skills = SkillHandler(self)
+
+    def total_skill_pips(self, skill: Skill) -> int:
+        """
+        Returns a skill's pips plus its governing attribute, cached per skill name
+        until the AttributeDict's version changes. A plain dict assigned to
+        attributes (e.g. by an editor) is just read uncached.
+        """
+        attributes = self.attributes
+        attr = SKILL_TO_ATTRIBUTE.get(skill.name)
+        version = getattr(attributes, 'version', None)
+        if version is None:
+            return skill.pips + (attributes.get(attr, 0) if attr else 0)
+        if self._pip_cache_source is not attributes or self._pip_cache_version != version:
+            self._pip_cache.clear()
+            self._pip_cache_source = attributes
+            self._pip_cache_version = version
+
+        total = self._pip_cache.get(skill.name)
+        if total is None:
+            total = skill.pips + (attributes.get(attr, 0) if attr else 0)
+            self._pip_cache[skill.name] = total
+        return total
         
     def get_attribute_or_skill_pips(self, name: str) -> int:
         """
@@ -263,17 +472,146 @@ class GameHistory:
     """Records the past few actions and dialogues in the game."""
     def __init__(self, max_entries=5):
         self.history = collections.deque(maxlen=max_entries)
+        self.count = 0 # Entries ever added, including those since dropped; lets the autosave journal find new ones.
+        self._history_string = None
 
     def add_action(self, actor_name, action_description):
         self.history.append(f"{actor_name} - {action_description}")
+        self.count += 1
+        self._history_string = None
 
     def add_dialogue(self, actor_name, dialogue_text):
         self.history.append(f"{actor_name}: \"{dialogue_text}\"")
+        self.count += 1
+        self._history_string = None
 
     def get_history_string(self):
-        if not self.history:
-            return "No recent history."
-        return "\n".join(list(self.history))
+        # Joined once per change rather than once per prompt.
+        if self._history_string is None:
+            self._history_string = "\n".join(self.history) if self.history else "No recent history."
+        return self._history_string
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+class LLMLog:
+    """
+    Records LLM calls, keeping the most recent max_entries in memory and spilling
+    older ones to an append-only JSON Lines file. Indexing and paging cover the
+    whole log; only the in-memory entries are pickled with a save.
+    A spill_path given by the caller is kept as a record of the session. Without
+    one, a temporary file is used and deleted on close() or when the log is
+    garbage collected.
+    """
+    def __init__(self, max_entries=200, spill_path=None):
+        self.max_entries = max_entries
+        self.spill_path = spill_path
+        self._recent = collections.deque()
+        self._offsets = [] # Byte offset of each spilled entry in spill_path.
+        self._file = None
+        self._lock = threading.Lock()
+        self._remove_temp_file = None # Set once a temporary spill file exists.
+
+    def append(self, entry):
+        with self._lock:
+            self._recent.append(entry)
+            while len(self._recent) > self.max_entries:
+                self._spill(self._recent.popleft())
+
+    def _spill(self, entry):
+        if self._file is None:
+            if self.spill_path is None:
+                fd, self.spill_path = tempfile.mkstemp(prefix="llm_log_", suffix=".jsonl")
+                os.close(fd)
+                self._remove_temp_file = weakref.finalize(self, _remove_file, self.spill_path)
+            self._file = open(self.spill_path, 'ab')
+        self._offsets.append(self._file.tell())
+        self._file.write(json.dumps(entry, default=str).encode('utf-8') + b"\n")
+        self._file.flush()
+
+    @property
+    def spilled_count(self):
+        """How many of the oldest entries live only on disk."""
+        return len(self._offsets)
+
+    def __len__(self):
+        return len(self._offsets) + len(self._recent)
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("LLM log index out of range")
+        return self.get_page(index, 1)[0]
+
+    def __iter__(self):
+        for start in range(0, self.spilled_count, self.max_entries):
+            yield from self.get_page(start, min(self.max_entries, self.spilled_count - start))
+        yield from list(self._recent)
+
+    def get_page(self, start, count):
+        """Returns up to count entries starting at index start, reading spilled ones back from disk."""
+        with self._lock:
+            start = max(0, start)
+            stop = min(len(self), start + count)
+            spilled = len(self._offsets)
+            entries = []
+            if start < spilled:
+                entries.extend(self._read_spilled(start, min(stop, spilled)))
+            entries.extend(self._recent[i - spilled] for i in range(max(start, spilled), stop))
+            return entries
+
+    def _read_spilled(self, start, stop):
+        try:
+            with open(self.spill_path, 'rb') as f:
+                f.seek(self._offsets[start])
+                return [json.loads(f.readline()) for _ in range(start, stop)]
+        except (OSError, ValueError):
+            # The spill file went missing, e.g. a save loaded on another machine.
+            return [{"type": "Unavailable", "prompt": f"Spilled entry not found in {self.spill_path}.", "response": {}}
+                    for _ in range(start, stop)]
+
+    def export(self, path):
+        """Writes the whole log, spilled entries included, to path as JSON Lines."""
+        with open(path, 'w', encoding='utf-8') as f:
+            for entry in self:
+                f.write(json.dumps(entry, default=str) + "\n")
+
+    def append_to(self, path, start):
+        """Appends the entries from index start on to a JSON Lines file, e.g. one export() wrote earlier."""
+        with open(path, 'a', encoding='utf-8') as f:
+            for page_start in range(start, len(self), self.max_entries):
+                for entry in self.get_page(page_start, self.max_entries):
+                    f.write(json.dumps(entry, default=str) + "\n")
+
+    def close(self):
+        """Closes the spill file, deleting it if it was temporary. Spilled entries are gone after that."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if self._remove_temp_file is not None:
+                self._remove_temp_file()
+                self._offsets = []
+                self.spill_path = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_file'] = None
+        state['_remove_temp_file'] = None # The copy doesn't own the temporary file.
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        state.setdefault('_remove_temp_file', None)
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
 
 class Party:
     """Manages a group of player characters."""
@@ -314,18 +652,67 @@ class GameState:
     game_history: 'GameHistory'
     players: List['Actor']
     actors: List['Actor']
-    llm_log: list = field(default_factory=list)
+    llm_log: LLMLog = field(default_factory=LLMLog)
+    # The session's dice. Every roll draws from it, so its seed and state reproduce a game.
+    rng: np.random.Generator = field(default_factory=np.random.default_rng, repr=False, compare=False)
+
+    # Bumped by every action that changes what prompts can see; see bump_world_version.
+    world_version: int = field(default=0, init=False, compare=False)
+    # Prompt fragments cached by llm_calls.location_context for the current world_version.
+    prompt_cache: dict = field(default_factory=dict, init=False, repr=False, compare=False)
+
+    # Lowercase name -> Actor. Players win over NPCs that share a name.
+    _actors_by_name: Dict[str, 'Actor'] = field(default_factory=dict, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.reindex_actors()
+
+    def bump_world_version(self):
+        """Marks the world as changed so cached prompt context is rebuilt."""
+        self.world_version += 1
 
     def find_actor_by_name(self, name: str):
         """Utility function to find any actor (player or NPC) by name."""
-        name_lower = name.lower()
-        for p in self.players:
-            if p.name.lower() == name_lower:
-                return p
-        for a in self.actors:
-            if a.name.lower() == name_lower:
-                return a
-        return None
+        return self._actors_by_name.get(name.lower())
+
+    def reindex_actors(self):
+        """Rebuilds the name lookup from the player and NPC lists."""
+        self._actors_by_name = {}
+        for a in self.players + self.actors:
+            self._actors_by_name.setdefault(a.name.lower(), a)
+
+    def _reindex_name(self, name_lower: str):
+        match = next((a for a in self.players + self.actors if a.name.lower() == name_lower), None)
+        if match:
+            self._actors_by_name[name_lower] = match
+        else:
+            self._actors_by_name.pop(name_lower, None)
+
+    def add_actor(self, actor: 'Actor'):
+        """Adds a player or NPC to the world."""
+        self.environment.add_actor(actor)
+        self._reindex_name(actor.name.lower())
+        self.bump_world_version()
+
+    def remove_actor(self, actor: 'Actor'):
+        """Removes a player or NPC from the world and the party."""
+        self.environment.remove_actor(actor)
+        self.party.remove_member(actor)
+        self._reindex_name(actor.name.lower())
+        self.bump_world_version()
+
+    def rename_actor(self, actor: 'Actor', new_name: str):
+        old_name_lower = actor.name.lower()
+        actor.name = new_name
+        self._reindex_name(old_name_lower)
+        self._reindex_name(new_name.lower())
+        self.bump_world_version()
+
+    def rebuild_indexes(self):
+        """Re-syncs every lookup index after the world has been edited by hand."""
+        self.environment.rebuild_index()
+        self.reindex_actors()
+        self.bump_world_version()
 
 import actions
 
@@ -345,6 +732,8 @@ class ActionHandler:
             "manage_party_member": actions.manage_party_member,
             "move_party": actions.move_party
         }
+        # Called as callback(actor, function_name, arguments, result) after every action.
+        self.after_action = []
 
     def execute_action(self, actor, function_name: str, arguments: dict):
         """
@@ -353,6 +742,13 @@ class ActionHandler:
         Returns:
             A string summarizing the mechanical result of the action.
         """
+        llm_arguments = dict(arguments)
+        result = self._dispatch(actor, function_name, arguments)
+        for callback in self.after_action:
+            callback(actor, function_name, llm_arguments, result)
+        return result
+
+    def _dispatch(self, actor, function_name: str, arguments: dict):
         arguments['game_state'] = self.game_state
         arguments['actor'] = actor
         
@@ -0,0 +1,189 @@
+import argparse
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+import numpy as np
+from d6_rules import roll_d6_dice_many, spawn_seeds, SKILL_TO_ATTRIBUTE
+from data_cache import load_yaml_cached
+from game_manager import INVENTORY_FILE
+
+@dataclass
+class Combatant:
+    """The numbers a melee exchange needs from one character sheet."""
+    name: str
+    side: int
+    hp: int
+    melee_pips: int
+    dodge_pips: int
+    initiative_pips: tuple # (dexterity, wisdom), rolled separately like GameManager.start_game.
+    weapon: str
+    weapon_value: int # 0 with no melee weapon equipped; such a combatant can't attack.
+    dr: int
+
+def _total_pips(sheet, name):
+    """Skill pips plus governing attribute, the same total as Actor.total_skill_pips."""
+    attributes = sheet.get('attributes') or {}
+    if name in attributes:
+        return attributes[name]
+    attr = SKILL_TO_ATTRIBUTE.get(name)
+    return (sheet.get('skills') or {}).get(name, 0) + (attributes.get(attr, 0) if attr else 0)
+
+def load_combatant(sheet_path, side, items, armor_dr=False):
+    """
+    Builds a Combatant from a character sheet. The weapon is the first equipped
+    item whose inventory entry is a melee weapon. DR is 0, as in the game, unless
+    armor_dr counts the value of equipped armor.
+    """
+    sheet = load_yaml_cached(sheet_path)
+    weapon, weapon_value, dr = None, 0, 0
+    for entry in sheet.get('inventory') or []:
+        details = items.get(str(entry.get('item', '')).lower())
+        if not entry.get('equipped') or not details:
+            continue
+        item_type = str(details.get('type', '')).lower()
+        if item_type == 'weapon' and str(details.get('skill', '')).lower() == 'melee' and weapon is None:
+            weapon, weapon_value = details['name'], int(details.get('value', 0))
+        elif item_type == 'armor' and armor_dr:
+            dr += int(details.get('value', 0))
+    return Combatant(
+        name=sheet.get('name', os.path.basename(sheet_path)),
+        side=side,
+        hp=int(sheet.get('cur_hp', sheet.get('max_hp', 0))),
+        melee_pips=_total_pips(sheet, 'melee'),
+        dodge_pips=_total_pips(sheet, 'dodge'),
+        initiative_pips=(_total_pips(sheet, 'dexterity'), _total_pips(sheet, 'wisdom')),
+        weapon=weapon,
+        weapon_value=weapon_value,
+        dr=dr,
+    )
+
+def simulate(combatants, trials, max_rounds=100, rng=None):
+    """
+    Fights every trial to the end at once, each array indexed by [trial] or
+    [trial, combatant]. Each round, living combatants attack in their trial's
+    initiative order, choosing a random living enemy. An attack is the
+    attacker's melee roll against the better of the target's dodge and melee
+    rolls. A hit deals weapon value + margin - DR, the same as the melee
+    branch of actions.execute_skill_check.
+
+    Returns (final_hp, rounds, winner, exchanges). winner is the winning side
+    per trial, or -1 if max_rounds ran out first.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    count = len(combatants)
+    side = np.array([c.side for c in combatants])
+    melee = np.array([c.melee_pips for c in combatants])
+    dodge = np.array([c.dodge_pips for c in combatants])
+    weapon_value = np.array([c.weapon_value for c in combatants])
+    dr = np.array([c.dr for c in combatants])
+    can_attack = weapon_value > 0
+    enemies = side[:, None] != side[None, :] # [attacker, target]
+
+    hp = np.tile(np.array([c.hp for c in combatants]), (trials, 1))
+    dex, wis = (np.array(p) for p in zip(*(c.initiative_pips for c in combatants)))
+    initiative = roll_d6_dice_many(np.broadcast_to(dex, (trials, count)), rng) + \
+        roll_d6_dice_many(np.broadcast_to(wis, (trials, count)), rng)
+    # Random tie-breaks, then highest initiative first.
+    order = np.lexsort((rng.random((trials, count)), -initiative), axis=-1)
+
+    rounds = np.zeros(trials, dtype=np.int64)
+    winner = np.full(trials, -1)
+    exchanges = 0
+
+    for round_number in range(1, max_rounds + 1):
+        # Only trials still being fought are touched, so long tails stay cheap.
+        live = np.flatnonzero(winner < 0)
+        if live.size == 0:
+            break
+        rounds[live] = round_number
+        for slot in range(count):
+            live = live[winner[live] < 0]
+            attacker = order[live, slot]
+            alive = hp[live] > 0
+            # Pick a random living enemy: random scores, masked to valid targets.
+            valid = enemies[attacker] & alive
+            acting = alive[np.arange(live.size), attacker] & can_attack[attacker] & valid.any(axis=1)
+            rows = np.flatnonzero(acting)
+            if rows.size == 0:
+                continue
+            d = np.where(valid[rows], rng.random((rows.size, count)), -1.0).argmax(axis=1)
+            t, a = live[rows], attacker[rows]
+
+            attack_roll = roll_d6_dice_many(melee[a], rng)
+            opposition = np.maximum(roll_d6_dice_many(dodge[d], rng), roll_d6_dice_many(melee[d], rng))
+            hit = attack_roll > opposition
+            damage = np.maximum(0, weapon_value[a] + attack_roll - opposition - dr[d]) * hit
+            hp[t, d] -= damage
+            exchanges += t.size
+
+            alive_now = hp[t] > 0
+            for s in (0, 1):
+                wiped_out = ~(alive_now & (side == s)).any(axis=1)
+                winner[t[wiped_out]] = 1 - s
+    return hp, rounds, winner, exchanges
+
+def _simulate_chunk(combatants, trials, max_rounds, seed_sequence):
+    return simulate(combatants, trials, max_rounds, np.random.default_rng(seed_sequence))
+
+def run(combatants, trials, max_rounds=100, workers=1, seed=None):
+    """Splits the trials across a process pool, each chunk on its own SeedSequence stream."""
+    workers = max(1, min(workers, trials))
+    chunks = [trials // workers + (1 if i < trials % workers else 0) for i in range(workers)]
+    streams = spawn_seeds(seed, workers)
+    if workers == 1:
+        results = [_simulate_chunk(combatants, chunks[0], max_rounds, streams[0])]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_simulate_chunk, [combatants] * workers, chunks, [max_rounds] * workers, streams))
+    hp = np.concatenate([r[0] for r in results])
+    rounds = np.concatenate([r[1] for r in results])
+    winner = np.concatenate([r[2] for r in results])
+    return hp, rounds, winner, sum(r[3] for r in results)
+
+def report(combatants, hp, rounds, winner, exchanges, elapsed):
+    trials = len(winner)
+    print(f"{trials} trials, {exchanges} exchanges in {elapsed:.2f} s ({exchanges / elapsed / 1e6:.2f}M exchanges/s)")
+    for s, label in ((0, "Side A"), (1, "Side B")):
+        names = ", ".join(c.name for c in combatants if c.side == s)
+        print(f"  {label} wins: {(winner == s).mean():7.2%}  ({names})")
+    print(f"  Unfinished : {(winner < 0).mean():7.2%}")
+    finished = winner >= 0
+    if finished.any():
+        print(f"  Rounds     : mean {rounds[finished].mean():.2f}, median {np.median(rounds[finished]):.0f}, "
+              f"90th pct {np.percentile(rounds[finished], 90):.0f}")
+    print("  Final HP (percentiles 10/50/90, survival rate):")
+    for i, c in enumerate(combatants):
+        p10, p50, p90 = np.percentile(hp[:, i], [10, 50, 90])
+        weapon = f"{c.weapon} ({c.weapon_value})" if c.weapon else "no melee weapon"
+        print(f"    {c.name:<16} start {c.hp:>3}  {p10:6.1f} {p50:6.1f} {p90:6.1f}  "
+              f"survives {(hp[:, i] > 0).mean():7.2%}  [{weapon}, DR {c.dr}]")
+
+def main():
+    parser = argparse.ArgumentParser(description="Estimate melee encounter outcomes by Monte Carlo.")
+    parser.add_argument("side_a", nargs="+", help="Character sheets fighting on side A.")
+    parser.add_argument("--vs", nargs="+", required=True, help="Character sheets fighting on side B.")
+    parser.add_argument("--inventory", default=INVENTORY_FILE)
+    parser.add_argument("--trials", type=int, default=100_000)
+    parser.add_argument("--max-rounds", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--armor-dr", action="store_true", help="Count equipped armor value as DR (the game currently uses 0).")
+    args = parser.parse_args()
+
+    items = {item['name'].lower(): item for item in load_yaml_cached(args.inventory).get('items', [])}
+    combatants = [load_combatant(path, 0, items, args.armor_dr) for path in args.side_a] + \
+                 [load_combatant(path, 1, items, args.armor_dr) for path in args.vs]
+    name_counts = Counter()
+    for c in combatants:
+        name_counts[c.name] += 1
+        if name_counts[c.name] > 1:
+            c.name = f"{c.name} #{name_counts[c.name]}"
+
+    started = time.perf_counter()
+    hp, rounds, winner, exchanges = run(combatants, args.trials, args.max_rounds, args.workers, args.seed)
+    report(combatants, hp, rounds, winner, exchanges, time.perf_counter() - started)
+
+if __name__ == "__main__":
+    main()
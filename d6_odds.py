@@ -0,0 +1,96 @@
+import math
+from functools import lru_cache
+import numpy as np
+from d6_rules import OPPOSED_SKILLS
+
+# Distinct (pips, DC) queries remembered per function; far more than a session ever asks.
+CACHE_SIZE = 4096
+
+_D6_FACE = np.full(6, 1 / 6)
+
+@lru_cache(maxsize=None)
+def dice_distribution(num_dice: int) -> np.ndarray:
+    """
+    Probability of each sum of num_dice d6s, indexed from the lowest sum
+    (num_dice). Built by convolving one more die onto the cached distribution
+    for num_dice - 1, so each dice count is computed once. Read-only.
+    """
+    if num_dice <= 0:
+        distribution = np.ones(1)
+    else:
+        distribution = np.convolve(dice_distribution(num_dice - 1), _D6_FACE)
+    distribution.setflags(write=False)
+    return distribution
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _tail(pips: int) -> tuple[int, np.ndarray]:
+    """
+    (lowest total, P(total >= lowest total + i) for each i) for a pool of pips,
+    which rolls pips // 3 dice plus the remainder flat, like d6_rules.roll_d6_dice.
+    """
+    num_dice, pips_modifier = divmod(max(0, pips), 3)
+    tail = np.cumsum(dice_distribution(num_dice)[::-1])[::-1]
+    tail.setflags(write=False)
+    return num_dice + pips_modifier, tail
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _cdf(pips: int) -> tuple[int, np.ndarray]:
+    """(lowest total, P(total <= lowest total + i) for each i) for a pool of pips."""
+    num_dice, pips_modifier = divmod(max(0, pips), 3)
+    cdf = np.cumsum(dice_distribution(num_dice))
+    cdf.setflags(write=False)
+    return num_dice + pips_modifier, cdf
+
+def _at_least(pips: int, total: int) -> float:
+    lowest, tail = _tail(pips)
+    index = total - lowest
+    if index <= 0:
+        return 1.0
+    return float(tail[index]) if index < len(tail) else 0.0
+
+def _at_most(pips: int, total: int) -> float:
+    lowest, cdf = _cdf(pips)
+    index = total - lowest
+    if index < 0:
+        return 0.0
+    return float(cdf[index]) if index < len(cdf) else 1.0
+
+@lru_cache(maxsize=CACHE_SIZE)
+def success_probability(base_trait_pips: int, difficulty_number: int, situational_pips_modifier: int = 0) -> float:
+    """Exact chance that roll_d6_check with the same arguments succeeds (total >= DC)."""
+    # Pips are whole numbers like in roll_d6_dice; totals are whole, so a fractional DC needs the next one up.
+    pips = max(0, int(base_trait_pips) + int(situational_pips_modifier))
+    return _at_least(pips, math.ceil(difficulty_number))
+
+@lru_cache(maxsize=CACHE_SIZE)
+def opposed_probability(attacker_pips: int, *defender_pips: int) -> float:
+    """
+    Exact chance that the attacker's roll beats every defender roll outright
+    (ties go to the defenders), e.g. a melee attack against the better of the
+    target's dodge and melee rolls: opposed_probability(melee, dodge, melee).
+    """
+    attacker_pips = int(attacker_pips)
+    defender_pips = [int(pips) for pips in defender_pips]
+    if not defender_pips:
+        return _at_least(attacker_pips, 1) # Nothing to oppose it; the game compares against 0.
+    num_dice, pips_modifier = divmod(max(0, attacker_pips), 3)
+    lowest = num_dice + pips_modifier
+    chance = 0.0
+    for index, p in enumerate(dice_distribution(num_dice)):
+        beaten = 1.0
+        for pips in defender_pips:
+            beaten *= _at_most(pips, lowest + index - 1)
+        chance += p * beaten
+    return chance
+
+def skill_odds(actor, difficulty_number: int) -> dict:
+    """Chance of each of actor's skills beating difficulty_number, by skill name."""
+    return {
+        name: success_probability(getattr(actor.skills, name).total_pips, difficulty_number)
+        for name in actor.skills.keys()
+    }
+
+def opposed_skill_probability(actor, skill: str, target) -> float:
+    """Chance of actor's skill beating target's opposing rolls from d6_rules.OPPOSED_SKILLS."""
+    defender_pips = [getattr(target.skills, name).total_pips for name in OPPOSED_SKILLS.get(skill, [])]
+    return opposed_probability(getattr(actor.skills, skill).total_pips, *defender_pips)
@@ -1,4 +1,5 @@
-import random
+from types import MappingProxyType
+import numpy as np
 
 COMBAT_SKILLS = ["melee", "missiles", "throwing"]
 
@@ -20,6 +21,13 @@ D6_SKILLS_BY_ATTRIBUTE = {
     ],
 }
 
+# Reverse lookup (skill -> governing attribute), built once at import.
+SKILL_TO_ATTRIBUTE = MappingProxyType({
+    skill: attr
+    for attr, skill_list in D6_SKILLS_BY_ATTRIBUTE.items()
+    for skill in skill_list
+})
+
 OPPOSED_SKILLS = {
     "deception": ["observation"],
     "melee": ["melee", "dodge"],
@@ -27,27 +35,78 @@ OPPOSED_SKILLS = {
     "missiles": ["dodge"]
 }
 
-def roll_d6_dice(pips_to_roll):
-    """Rolls a number of d6s based on pips."""
-    pips_to_roll = max(0, int(pips_to_roll))
-    num_dice, pips_modifier = divmod(pips_to_roll, 3)
+# Shared generator for callers that don't supply their own.
+_default_rng = np.random.default_rng()
+
+def spawn_seeds(seed, count):
+    """
+    Splits one seed into count independent SeedSequences, e.g. one per game or
+    worker in a parallel run. A None seed draws fresh entropy, which each
+    child's .entropy still records.
+    """
+    return np.random.SeedSequence(seed).spawn(count)
+
+def spawn_rngs(seed, count):
+    """Like spawn_seeds, but returns ready-made Generators."""
+    return [np.random.default_rng(seed_sequence) for seed_sequence in spawn_seeds(seed, count)]
+
+def roll_d6_dice_many(pips_array, rng=None):
+    """
+    Rolls a whole array of pip pools in one vectorized call.
+    Every 3 pips is one d6 and the remainder is added flat, exactly like
+    rolling each die individually. Returns an int array shaped like the input
+    (a plain int for a scalar input).
+    """
+    rng = rng if rng is not None else _default_rng
+    pips = np.maximum(np.asarray(pips_array, dtype=np.int64), 0)
+    num_dice, pips_modifier = np.divmod(pips, 3)
+
+    if pips.ndim == 0:
+        return roll_d6_dice(int(pips), rng)
 
-    if num_dice <= 0:
+    max_dice = int(num_dice.max()) if num_dice.size else 0
+    if max_dice == 0:
         return pips_modifier
 
-    rolls = [random.randint(1, 6) for _ in range(num_dice)]
-    total = sum(rolls) + pips_modifier
+    # Roll a rectangular block and mask off the dice each pool doesn't have.
+    rolls = rng.integers(1, 7, size=pips.shape + (max_dice,))
+    rolls[np.arange(max_dice) >= num_dice[..., None]] = 0
+    return rolls.sum(axis=-1) + pips_modifier
 
-    return total
+def roll_d6_check_many(base_trait_pips, difficulty_number, situational_pips_modifier=0, rng=None):
+    """
+    Vectorized version of roll_d6_check. All arguments broadcast against each other.
+    Returns arrays of roll totals and successes.
+    """
+    effective_pips = np.maximum(
+        np.asarray(base_trait_pips) + np.asarray(situational_pips_modifier), 0
+    )
+    effective_pips, difficulty_number = np.broadcast_arrays(effective_pips, difficulty_number)
+
+    roll_totals = roll_d6_dice_many(effective_pips, rng)
+    successes = roll_totals >= difficulty_number
+
+    return roll_totals, successes
+
+def roll_d6_dice(pips_to_roll, rng=None):
+    """
+    Rolls a number of d6s based on pips. Fine for one roll at a time; callers
+    with many pools to roll at once should use roll_d6_dice_many instead.
+    """
+    rng = rng if rng is not None else _default_rng
+    num_dice, pips_modifier = divmod(max(0, int(pips_to_roll)), 3)
+    if num_dice == 0:
+        return pips_modifier
+    return sum(rng.integers(1, 7, size=num_dice).tolist()) + pips_modifier
 
-def roll_d6_check(base_trait_pips, difficulty_number, situational_pips_modifier=0):
+def roll_d6_check(base_trait_pips, difficulty_number, situational_pips_modifier=0, rng=None):
     """
     Performs a standard D6 skill check against a difficulty number.
     Returns the total roll and whether the check was a success.
     """
     effective_pips = max(0, base_trait_pips + situational_pips_modifier)
 
-    roll_total = roll_d6_dice(effective_pips)
+    roll_total = roll_d6_dice(effective_pips, rng)
     success = roll_total >= difficulty_number
     
-    return roll_total, success
\ No newline at end of file
+    return roll_total, success
@@ -0,0 +1,70 @@
+import hashlib
+import os
+import pickle
+import yaml
+
+# Parsed YAML is pickled here, one file per source path.
+CACHE_DIR = ".cache"
+CACHE_VERSION = 1
+
+# libyaml's loader is many times faster than the pure-Python one; fall back if it isn't built in.
+SafeLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# cache file -> (mtime_ns, size, pickled data), so repeated loads in one run skip the disk.
+_memory = {}
+
+def parse_yaml(stream):
+    """yaml.safe_load, using the libyaml loader when available."""
+    return yaml.load(stream, Loader=SafeLoader)
+
+def _cache_path(path, cache_dir):
+    name = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, f"{name}.pickle")
+
+def _read_cache(cache_path):
+    try:
+        with open(cache_path, "rb") as f:
+            entry = pickle.load(f)
+        return entry if entry.get("version") == CACHE_VERSION else None
+    except Exception:
+        return None
+
+def _write_cache(cache_path, entry):
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        temp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, cache_path)
+    except OSError:
+        pass # A read-only checkout just runs without the cache.
+
+def load_yaml_cached(path, cache_dir=CACHE_DIR):
+    """
+    Loads a YAML file through a pickle cache keyed on the file's path, mtime,
+    size and sha256. Each call returns a fresh copy, so callers may mutate it.
+    Raises the same FileNotFoundError / yaml.YAMLError as parsing directly.
+    """
+    stat = os.stat(path)
+    cache_path = _cache_path(path, cache_dir)
+
+    cached = _memory.get(cache_path)
+    if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        return pickle.loads(cached[2])
+
+    entry = _read_cache(cache_path)
+    if entry and (entry["mtime_ns"], entry["size"]) == (stat.st_mtime_ns, stat.st_size):
+        _memory[cache_path] = (stat.st_mtime_ns, stat.st_size, entry["data"])
+        return pickle.loads(entry["data"])
+
+    with open(path, "rb") as f:
+        raw = f.read()
+    sha256 = hashlib.sha256(raw).hexdigest()
+    if entry and entry["sha256"] == sha256:
+        data = entry["data"] # Touched but unchanged; just refresh the stat key.
+    else:
+        data = pickle.dumps(parse_yaml(raw), protocol=pickle.HIGHEST_PROTOCOL)
+    _write_cache(cache_path, {"version": CACHE_VERSION, "path": path, "mtime_ns": stat.st_mtime_ns,
+                              "size": stat.st_size, "sha256": sha256, "data": data})
+    _memory[cache_path] = (stat.st_mtime_ns, stat.st_size, data)
+    return pickle.loads(data)
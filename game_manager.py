@@ -1,34 +1,94 @@
+import os
+import shutil
 import yaml
-import pickle
-from llm_calls import player_action, npc_action, narration
-from d6_rules import roll_d6_dice
+import numpy as np
+import save_format
+import journal
+from data_cache import load_yaml_cached
+from concurrent.futures import ThreadPoolExecutor
+from llm_calls import player_action, plan_npc_action, apply_npc_action, narration
+from d6_rules import roll_d6_dice_many
 from classes import GameState
 from classes import ActionHandler
-from classes import Environment, GameHistory, Party
+from classes import Environment, GameHistory, Party, LLMLog
 
 SCENARIO_FILE = "Training_Grounds.yaml"
 INVENTORY_FILE = "inventory.yaml"
 
+def llm_log_file(save_path):
+    """Where save_game writes a save's LLM log, which replay.py plays the session back from."""
+    return save_path + ".llm.jsonl"
+
+def text_log_file(save_path):
+    """Where save_game keeps the GUI's text log, which isn't game state and so stays out of the save."""
+    return save_path + ".log.txt"
+
 class GameManager:
     """Manages the overall game state, logic, and turn progression."""
 
-    def __init__(self, llm_config):
-        """Initializes the game by loading all necessary data."""
+    def __init__(self, llm_config, scenario_file=SCENARIO_FILE, inventory_file=INVENTORY_FILE, seed=None):
+        """
+        Initializes the game by loading all necessary data. seed (an int or a
+        numpy SeedSequence, e.g. from d6_rules.spawn_seeds) fixes every dice roll
+        of the session; without one the dice are seeded from fresh entropy,
+        which saves still record.
+        """
         self.llm_config = llm_config
+        self.scenario_file = scenario_file
+        self.inventory_file = inventory_file
         self._load_data()
-        self._setup_game_state()
+        self._setup_game_state(seed)
         self.action_handler = ActionHandler(self.game_state, self.llm_config)
         self.turn_order = []
         self.current_turn_index = 0
         self.gui_text_log = ""
+        self._saved_llm_log = (None, 0) # (LLM log file of the last save or load, entries of ours it holds).
+        self.autosave = None # Started by start_game, so building a GameManager never touches an old autosave.
+
+    def enable_autosave(self, path, snapshot_every=50, overwrite=False):
+        """
+        Journals every action and turn to path (see journal.AutosaveJournal).
+        Raises FileExistsError if an autosave from another session is there, unless overwrite.
+        """
+        if self.autosave is not None:
+            overwrite = overwrite or os.path.abspath(self.autosave.path) == os.path.abspath(path)
+            self.autosave.close()
+            self.action_handler.after_action.remove(self.autosave.on_action)
+            self.autosave = None
+        autosave = journal.AutosaveJournal(path, snapshot_every)
+        autosave.attach(self, overwrite=overwrite)
+        self.autosave = autosave
+        self.action_handler.after_action.append(self.autosave.on_action)
+
+    def _start_autosave(self, overwrite=False):
+        """Starts the autosave configured in llm_config, if any, leaving an earlier session's autosave alone."""
+        path = self.llm_config.get('autosave_path')
+        if not path:
+            return
+        try:
+            self.enable_autosave(path, self.llm_config.get('autosave_snapshot_every', 50), overwrite)
+        except FileExistsError:
+            print(f"Warning: an autosave from an earlier session is at {path}; not autosaving this game. "
+                  f"Recover it with GameManager.load_game({path!r}) or delete it.")
+
+    def close(self):
+        """Ends the session cleanly: closes the LLM log and deletes the autosave, which only guards against crashes."""
+        self.game_state.llm_log.close()
+        if self.autosave is not None:
+            self.autosave.discard()
+            self.action_handler.after_action.remove(self.autosave.on_action)
+            self.autosave = None
+
+    def _checkpoint(self, kind):
+        """Journals the state at a turn boundary, if autosave is on."""
+        if self.autosave is not None:
+            self.autosave.record(kind)
 
     def _load_data(self):
         """Loads scenario, items, and spells from YAML files."""
         try:
-            with open(SCENARIO_FILE, 'r') as f:
-                self.scenario_data = yaml.safe_load(f)
-            with open(INVENTORY_FILE, 'r') as f:
-                self.all_items = yaml.safe_load(f).get('items', [])
+            self.scenario_data = load_yaml_cached(self.scenario_file)
+            self.all_items = load_yaml_cached(self.inventory_file).get('items', [])
         except FileNotFoundError as e:
             raise Exception(f"Error loading game data: {e}")
         except yaml.YAMLError as e:
@@ -37,13 +97,12 @@ class GameManager:
     def _load_character_sheet(self, filepath):
         """Helper to load a character sheet."""
         try:
-            with open(filepath, 'r') as f:
-                return yaml.safe_load(f)
+            return load_yaml_cached(filepath)
         except (FileNotFoundError, yaml.YAMLError) as e:
             print(f"ERROR: Could not load/parse character sheet at {filepath}: {e}")
             return None
 
-    def _setup_game_state(self):
+    def _setup_game_state(self, seed=None):
         """
         Instantiates the environment, players, and NPCs, and then bundles them
         into a single GameState object.
@@ -68,76 +127,198 @@ class GameManager:
             party=party,
             game_history=game_history,
             players=environment.players,
-            actors=environment.actors
+            actors=environment.actors,
+            llm_log=self._new_llm_log(),
+            rng=np.random.default_rng(seed),
+        )
+
+    def _new_llm_log(self):
+        """Creates the LLM call log, sized from llm_config."""
+        return LLMLog(
+            max_entries=self.llm_config.get('llm_log_entries', 200),
+            spill_path=self.llm_config.get('llm_log_path'),
         )
 
 
+    def capture_state(self):
+        """Returns the game's mutable state as plain data (see save_format.capture_state)."""
+        return save_format.capture_state(self, self.scenario_file, self.inventory_file)
+
     def save_game(self, filepath):
-        """Saves the current game state to a file using pickle."""
+        """
+        Saves the game's mutable state in the compact save format (see
+        save_format.py). The scenario and item files are referenced, not copied.
+        The session's whole LLM log is kept next to it (see llm_log_file), so
+        the session can be played back with replay.py, as is the GUI's text log
+        if there is one (see text_log_file).
+        """
         try:
-            with open(filepath, 'wb') as f:
-                pickle.dump(self, f)
+            data = save_format.dumps(self.capture_state())
+            temp_path = filepath + ".tmp"
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            self._save_llm_log(llm_log_file(filepath))
+            if self.gui_text_log:
+                with open(text_log_file(filepath), 'w', encoding='utf-8') as f:
+                    f.write(self.gui_text_log)
+            elif os.path.exists(text_log_file(filepath)):
+                os.remove(text_log_file(filepath)) # Left by an earlier save to the same path.
+            os.replace(temp_path, filepath)
             return True
         except Exception as e:
             print(f"Error saving game: {e}")
             return False
 
-    @staticmethod
-    def load_game(filepath):
-        """Loads a game state from a file using pickle."""
+    def _save_llm_log(self, log_path):
+        """
+        Brings the LLM log file at log_path up to date. The file from the last
+        save or load already holds the session so far, so only newer entries are
+        appended to it (after copying it, for a save to a new path), keeping the
+        cost of a save independent of how long the session has run.
+        """
+        llm_log = self.game_state.llm_log
+        source, saved = self._saved_llm_log
+        if source is None or not os.path.exists(source) or saved > len(llm_log):
+            llm_log.export(log_path + ".tmp")
+            os.replace(log_path + ".tmp", log_path)
+        else:
+            if os.path.abspath(source) != os.path.abspath(log_path):
+                shutil.copyfile(source, log_path)
+            llm_log.append_to(log_path, saved)
+        self._saved_llm_log = (log_path, len(llm_log))
+
+    @classmethod
+    def load_game(cls, filepath, llm_config=None):
+        """
+        Loads a saved game, rebuilt on top of the scenario files; it needs the
+        llm_config to play with. Anything but a save in the current format is
+        refused: the SaveFormatError is reported and None returned. An
+        autosave's journal, if present, is replayed on top of it. The save's
+        LLM log isn't read; later saves carry it on.
+        """
         try:
             with open(filepath, 'rb') as f:
-                return pickle.load(f)
+                data = f.read()
+            state = save_format.loads(data)
+            if os.path.exists(filepath + ".journal"):
+                state = journal.replay(state, filepath + ".journal")
+            for ref in save_format.data_file_refs(state):
+                if ref["sha256"] and ref["sha256"] != save_format.file_sha256(ref["path"]):
+                    print(f"Warning: {ref['path']} has changed since this game was saved.")
+
+            game_manager = cls.__new__(cls)
+            game_manager.scenario_file = state["scenario"]["path"]
+            game_manager.inventory_file = state["inventory"]["path"]
+            game_manager.llm_config = llm_config if llm_config is not None else {}
+            game_manager._load_data()
+            save_format.restore_state(game_manager, state, game_manager._new_llm_log())
+            # The log file so far stays on disk; saves append this session's entries to it.
+            has_llm_log = os.path.exists(llm_log_file(filepath))
+            game_manager._saved_llm_log = (llm_log_file(filepath) if has_llm_log else None, 0)
+            if os.path.exists(text_log_file(filepath)):
+                with open(text_log_file(filepath), 'r', encoding='utf-8') as f:
+                    game_manager.gui_text_log = f.read()
+            game_manager.action_handler = ActionHandler(game_manager.game_state, game_manager.llm_config)
+            game_manager.autosave = None
+            # Loading the autosave itself recovers it, so journaling carries on in its place.
+            autosave_path = game_manager.llm_config.get('autosave_path')
+            game_manager._start_autosave(
+                overwrite=bool(autosave_path) and os.path.abspath(autosave_path) == os.path.abspath(filepath))
+            return game_manager
         except Exception as e:
             print(f"Error loading game: {e}")
             return None
 
-    def _process_npc_turns(self):
+    def _upcoming_npcs(self):
+        """Returns the run of NPCs due to act before the next player, in initiative order."""
+        npcs = []
+        index = self.current_turn_index
+        while len(npcs) < len(self.turn_order):
+            character = self.turn_order[index]
+            if character.is_player: break
+            npcs.append(character)
+            index = (index + 1) % len(self.turn_order)
+        return npcs
+
+    def _plan_npc_turns(self, npcs):
+        """
+        Plans several NPC turns concurrently. Every NPC plans against the same
+        snapshot of the world, so later NPCs don't see earlier NPCs' actions.
+        """
+        max_workers = min(len(npcs), self.llm_config.get('npc_workers', 8))
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            return list(pool.map(lambda npc: plan_npc_action(npc, self.game_state, self.llm_config), npcs))
+
+    def _process_npc_turns(self, on_token=None):
+        """
+        Runs NPC turns until it's a player's turn, or for one full round if nobody in
+        the turn order is a player. on_token, if given, receives each turn's header
+        and streamed narrative as they happen (sequential mode only).
+        """
         output_log = []
         while True:
             if not self.turn_order: break
-            current_character = self.turn_order[self.current_turn_index]
-            if current_character.is_player: break
-            
-            output_log.append(f"\n--- {current_character.name}'s Turn ---")
-            
-            npc_turn_result = npc_action(
-                current_character, 
-                self.game_state,
-                self.action_handler,
-                self.llm_config
-            )
-            
-            if npc_turn_result.get("narrative"):
-                output_log.append(npc_turn_result["narrative"])
-            if npc_turn_result.get("mechanical"):
-                mechanical_text = npc_turn_result["mechanical"]
-                output_log.append(f"Mechanics: {mechanical_text}")
+            npcs = self._upcoming_npcs()
+            if not npcs: break
+
+            # In concurrent mode the LLM round trips overlap, but results are still
+            # applied one at a time in initiative order so the rules stay deterministic.
+            if self.llm_config.get('concurrent_npc_turns') and len(npcs) > 1:
+                plans = self._plan_npc_turns(npcs)
+            else:
+                plans = [None] * len(npcs)
+
+            for current_character, plan in zip(npcs, plans):
+                turn_header = f"\n--- {current_character.name}'s Turn ---"
+                output_log.append(turn_header)
+
+                if plan is None:
+                    if on_token:
+                        on_token(turn_header + "\n")
+                    plan = plan_npc_action(current_character, self.game_state, self.llm_config, on_token)
+                npc_turn_result = apply_npc_action(
+                    current_character,
+                    self.game_state,
+                    self.action_handler,
+                    plan
+                )
                 
-            self.current_turn_index = (self.current_turn_index + 1) % len(self.turn_order)
+                if npc_turn_result.get("narrative"):
+                    output_log.append(npc_turn_result["narrative"])
+                if npc_turn_result.get("mechanical"):
+                    mechanical_text = npc_turn_result["mechanical"]
+                    output_log.append(f"Mechanics: {mechanical_text}")
+                    
+                self.current_turn_index = (self.current_turn_index + 1) % len(self.turn_order)
+                self._checkpoint("npc_turn")
+
+            if len(npcs) == len(self.turn_order):
+                break # No player to hand the turn back to; without this an all-NPC game never returns.
         return output_log
 
-    def start_game(self):
+    def start_game(self, on_token=None):
         all_combatants = self.game_state.players + self.game_state.actors
         
-        initiative_rolls = []
-        for combatant in all_combatants:
-            dex_pips = combatant.get_attribute_or_skill_pips('dexterity')
-            wis_pips = combatant.get_attribute_or_skill_pips('wisdom')
-            score = roll_d6_dice(dex_pips) + roll_d6_dice(wis_pips)
-            initiative_rolls.append((score, combatant))
-            
+        # Everyone's dexterity and wisdom rolls in one batch.
+        pips = np.array([[combatant.get_attribute_or_skill_pips('dexterity'),
+                          combatant.get_attribute_or_skill_pips('wisdom')] for combatant in all_combatants],
+                        dtype=np.int64).reshape(-1, 2)
+        scores = roll_d6_dice_many(pips, self.game_state.rng).sum(axis=1)
+        initiative_rolls = list(zip(scores.tolist(), all_combatants))
+
         initiative_rolls.sort(key=lambda x: x[0], reverse=True)
         self.turn_order = [combatant for _, combatant in initiative_rolls]
         self.current_turn_index = 0
+        # A new game: the first snapshot. Restarting replaces this session's own autosave.
+        self._start_autosave()
         
         output_log = ["--- Welcome Adventurer ---"]
         
-        npc_logs = self._process_npc_turns()
+        npc_logs = self._process_npc_turns(on_token)
         output_log.extend(npc_logs)
         return "\n".join(output_log)
 
-    def process_player_command(self, command):
+    def process_player_command(self, command, on_token=None):
         if not self.turn_order:
             return "The game hasn't started yet. Please start a new game."
             
@@ -162,8 +343,9 @@ class GameManager:
             output_log.append(f"{player_character.name}: \"{command}\"")
             
         self.current_turn_index = (self.current_turn_index + 1) % len(self.turn_order)
+        self._checkpoint("player_turn")
         
-        npc_logs = self._process_npc_turns()
+        npc_logs = self._process_npc_turns(on_token)
         output_log.extend(npc_logs)
         
         next_player_character = self.turn_order[self.current_turn_index]
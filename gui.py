@@ -1,8 +1,16 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext, Frame, Entry, Button, Menu, filedialog
 from character_creator import CharacterCreatorWindow
+from classes import AttributeDict
 import os
 import json
+import queue
+import threading
+
+# How often (ms) the Tk thread checks for results from the turn worker.
+TURN_POLL_INTERVAL_MS = 50
+# How many LLM log entries the debug tab shows at once.
+LLM_LOG_PAGE_SIZE = 25
 
 class GameGUI:
     """A simple graphical user interface for a text-based game."""
@@ -18,12 +26,17 @@ class GameGUI:
         
         self.debug_win = None
 
+        # Turns run on a worker thread and report back through this queue.
+        self.turn_queue = queue.Queue()
+        self.turn_in_flight = False
+
     def _create_menu(self):
         """Creates the main menu bar for the application."""
         self.menu_bar = Menu(self.root)
         self.root.config(menu=self.menu_bar)
 
         file_menu = Menu(self.menu_bar, tearoff=0)
+        self.file_menu = file_menu
         self.menu_bar.add_cascade(label="File", menu=file_menu)
         file_menu.add_command(label="New Game", command=self.new_game)
         file_menu.add_command(label="Character Creator", command=self.open_character_creator)
@@ -51,6 +64,8 @@ class GameGUI:
         self.input_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, ipady=4)
         self.send_button = Button(input_frame, text="Send", command=self.process_input)
         self.send_button.pack(side=tk.RIGHT, padx=(5, 0))
+        # Shown only while a turn is being processed.
+        self.progress_bar = ttk.Progressbar(input_frame, mode='indeterminate', length=100)
 
     def open_debug_window(self):
         if not self.game_manager.turn_order:
@@ -63,18 +78,85 @@ class GameGUI:
 
     def process_input(self, event=None):
         """Processes user input and automatically refreshes the debug panel."""
+        if self.turn_in_flight: return
         user_input = self.input_entry.get()
         if not user_input.strip(): return
         
         self.input_entry.delete(0, tk.END)
         self.add_output(f"> {user_input}\n")
 
-        game_response = self.game_manager.process_player_command(user_input)
+        self._run_turn(
+            lambda: self.game_manager.process_player_command(user_input, on_token=self._queue_token),
+            self._on_player_turn_done
+        )
+
+    def _on_player_turn_done(self, game_response):
         self.add_output(f"{game_response}\n\n")
 
         if self.debug_win and self.debug_win.winfo_exists():
             self.debug_win.refresh_all_tabs()
 
+    def _run_turn(self, work, on_done):
+        """
+        Runs `work` on a worker thread so the window stays responsive during LLM calls.
+        `on_done(result)` is called back on the Tk thread once it finishes.
+        """
+        self._set_busy(True)
+        # Streamed text goes after this mark and is swapped for the final log when the turn ends.
+        self.output_text.mark_set("stream_start", "end-1c")
+        self.output_text.mark_gravity("stream_start", tk.LEFT)
+
+        def worker():
+            try:
+                self.turn_queue.put(("done", on_done, work()))
+            except Exception as e:
+                self.turn_queue.put(("error", on_done, e))
+
+        threading.Thread(target=worker, daemon=True).start()
+        self.root.after(TURN_POLL_INTERVAL_MS, self._poll_turn_queue)
+
+    def _queue_token(self, text):
+        """Called on the worker thread with each piece of streamed narrative."""
+        self.turn_queue.put(("token", None, text))
+
+    def _poll_turn_queue(self):
+        """Shows streamed text and checks for the turn's result; reschedules itself until the turn is done."""
+        while True:
+            try:
+                kind, on_done, value = self.turn_queue.get_nowait()
+            except queue.Empty:
+                self.root.after(TURN_POLL_INTERVAL_MS, self._poll_turn_queue)
+                return
+            if kind != "token":
+                break
+            self.add_output(value)
+
+        self.output_text.config(state='normal')
+        self.output_text.delete("stream_start", "end-1c")
+        self.output_text.config(state='disabled')
+        self._set_busy(False)
+        if kind == "error":
+            self.add_output(f"Error while processing the turn: {value}\n\n")
+        else:
+            on_done(value)
+
+    def _set_busy(self, busy):
+        """Locks input and shows the progress bar while a turn is in flight."""
+        self.turn_in_flight = busy
+        state = 'disabled' if busy else 'normal'
+        self.input_entry.config(state=state)
+        self.send_button.config(state=state)
+        for label in ("New Game", "Save Game", "Load Game"):
+            self.file_menu.entryconfig(label, state=state)
+
+        if busy:
+            self.progress_bar.pack(side=tk.RIGHT, padx=(5, 0))
+            self.progress_bar.start(10)
+        else:
+            self.progress_bar.stop()
+            self.progress_bar.pack_forget()
+            self.input_entry.focus_set()
+
     def add_output(self, text):
         self.output_text.config(state='normal')
         self.output_text.insert(tk.END, text)
@@ -82,10 +164,14 @@ class GameGUI:
         self.output_text.see(tk.END)
 
     def new_game(self):
+        if self.turn_in_flight: return
         self.output_text.config(state='normal')
         self.output_text.delete('1.0', tk.END)
-        initial_text = self.game_manager.start_game()
-        self.add_output(initial_text + "\n")
+        self.output_text.config(state='disabled')
+        self._run_turn(
+            lambda: self.game_manager.start_game(on_token=self._queue_token),
+            lambda initial_text: self.add_output(initial_text + "\n")
+        )
 
     def save_game(self):
         if not self.game_manager or not self.game_manager.turn_order:
@@ -103,8 +189,9 @@ class GameGUI:
     def load_game(self):
         filepath = filedialog.askopenfilename(filetypes=[("Save Files", "*.sav"), ("All Files", "*.*")], title="Load Game")
         if not filepath: return
-        loaded_game_manager = self.game_manager.__class__.load_game(filepath)
+        loaded_game_manager = self.game_manager.__class__.load_game(filepath, getattr(self.game_manager, 'llm_config', None))
         if loaded_game_manager:
+            self.game_manager.close()
             self.game_manager = loaded_game_manager
             self.output_text.config(state='normal')
             self.output_text.delete('1.0', tk.END)
@@ -241,7 +328,7 @@ class DebugWindow(tk.Toplevel):
 
     def _create_structured_list_row(self, parent_frame, item_data, widget_list, attr_name):
         """Creates the UI for a single structured list item and adds it to the list."""
-        item_dict = vars(item_data) if not isinstance(item_data, dict) else item_data
+        item_dict = {k: v for k, v in vars(item_data).items() if not k.startswith('_')} if not isinstance(item_data, dict) else item_data
         
         item_widgets = {}
         row_frame = Frame(parent_frame, bd=1, relief=tk.RIDGE)
@@ -377,7 +464,8 @@ class DebugWindow(tk.Toplevel):
         self.attribute_widgets = {}
         
         all_attr_keys = set(vars(self.selected_entity).keys())
-        attrs = sorted([attr for attr in all_attr_keys if attr not in ['source_data', 'manager']])
+        # Underscore fields are internal bookkeeping (caches and the like), not game data.
+        attrs = sorted([attr for attr in all_attr_keys if attr not in ['source_data', 'manager'] and not attr.startswith('_')])
 
         self.details_frame.grid_columnconfigure(1, weight=1)
         self._bind_scroll_recursive(self.details_frame, self.main_canvas)
@@ -518,6 +606,14 @@ class DebugWindow(tk.Toplevel):
             sub_entries[key] = entry
         self.attribute_widgets[attr_name] = sub_entries
 
+    @staticmethod
+    def _like(orig_val, new_dict):
+        """
+        Keeps an edited mapping the same kind as the one it replaces, so an actor's
+        attributes stay an AttributeDict and its cached skill pips are refreshed.
+        """
+        return AttributeDict(new_dict) if isinstance(orig_val, AttributeDict) else new_dict
+
     def save_entity_details(self):
         if not self.selected_entity: return
         
@@ -537,7 +633,7 @@ class DebugWindow(tk.Toplevel):
                     if attr == 'attitudes': 
                          setattr(self.selected_entity, attr, [{k: v} for k, v in new_dict.items()])
                     else:
-                         setattr(self.selected_entity, attr, new_dict)
+                         setattr(self.selected_entity, attr, self._like(orig_val, new_dict))
 
                 elif isinstance(collection, list) and isinstance(orig_val, list):
                     if not collection or isinstance(collection[0], Entry): # Simple List
@@ -580,7 +676,7 @@ class DebugWindow(tk.Toplevel):
                         orig_type = type(orig_val.get(key, ''))
                         try: new_dict[key] = orig_type(val_str)
                         except (ValueError, TypeError): new_dict[key] = val_str
-                    setattr(self.selected_entity, attr, new_dict)
+                    setattr(self.selected_entity, attr, self._like(orig_val, new_dict))
 
                 elif isinstance(collection, tk.BooleanVar):
                     setattr(self.selected_entity, attr, collection.get())
@@ -601,6 +697,8 @@ class DebugWindow(tk.Toplevel):
             except Exception as e:
                 messagebox.showerror("Save Error", f"Could not save attribute '{attr}'.\nError: {e}")
 
+        # Names and locations may have been edited by hand.
+        self.game_manager.game_state.rebuild_indexes()
         messagebox.showinfo("Success", f"Attributes for {self.selected_entity.name} have been updated.")
         self.show_entity_details()
 
@@ -648,32 +746,143 @@ class DebugWindow(tk.Toplevel):
 
     def _create_llm_log_tab(self):
         """Creates the widgets for the LLM Log tab."""
+        nav_frame = Frame(self.tab_llm_log)
+        nav_frame.pack(fill="x", padx=5, pady=(5, 0))
+        Button(nav_frame, text="< Older", command=lambda: self._page_llm_log(-LLM_LOG_PAGE_SIZE)).pack(side="left")
+        Button(nav_frame, text="Newer >", command=lambda: self._page_llm_log(LLM_LOG_PAGE_SIZE)).pack(side="left", padx=5)
+        Button(nav_frame, text="Latest", command=lambda: self._page_llm_log(None)).pack(side="left")
+        self.llm_log_page_label = ttk.Label(nav_frame, text="")
+        self.llm_log_page_label.pack(side="right")
+
+        # None follows the newest entries; otherwise the index of the first entry shown.
+        self.llm_log_page_start = None
+        # What the text widget currently holds: entries [first, next) of which log.
+        self._llm_log_shown = None
+        self._llm_log_first = 0
+        self._llm_log_next = 0
+        self._llm_log_visible = {} # Index -> entry, for the entries on screen.
+        self._llm_log_expanded = set()
+
         self.llm_log_text = scrolledtext.ScrolledText(self.tab_llm_log, wrap=tk.WORD, state='disabled', font=("Courier", 10))
         self.llm_log_text.pack(fill="both", expand=True)
+        self.llm_log_text.tag_configure("llm_header", foreground="blue")
+        self.llm_log_text.tag_bind("llm_header", "<Button-1>", self._toggle_llm_log_entry)
+        self.llm_log_text.tag_bind("llm_header", "<Enter>", lambda e: self.llm_log_text.config(cursor="hand2"))
+        self.llm_log_text.tag_bind("llm_header", "<Leave>", lambda e: self.llm_log_text.config(cursor=""))
         self.refresh_llm_log_tab()
-        
+
+    def _page_llm_log(self, step):
+        """Moves the LLM log view by step entries, or back to the newest page if step is None."""
+        total = len(self.game_manager.game_state.llm_log)
+        latest_start = max(0, total - LLM_LOG_PAGE_SIZE)
+        if step is None:
+            self.llm_log_page_start = None
+        else:
+            current = latest_start if self.llm_log_page_start is None else self.llm_log_page_start
+            new_start = min(max(0, current + step), latest_start)
+            self.llm_log_page_start = None if new_start == latest_start else new_start
+        self.refresh_llm_log_tab()
+
     def refresh_llm_log_tab(self):
-        """Populates the LLM Log tab with the latest call data."""
+        """
+        Brings the LLM Log tab up to date. When following the newest entries, only
+        entries added since the last refresh are rendered, and the oldest ones are
+        dropped once more than a page is on screen. Entries start collapsed.
+        """
         if not self.game_manager.turn_order or not hasattr(self.game_manager.game_state, 'llm_log'):
             return
 
+        llm_log = self.game_manager.game_state.llm_log
+        total = len(llm_log)
         self.llm_log_text.config(state='normal')
+        if self.llm_log_page_start is not None:
+            if llm_log is not self._llm_log_shown or self._llm_log_first != self.llm_log_page_start:
+                self._render_llm_log_page(llm_log, self.llm_log_page_start)
+        elif llm_log is not self._llm_log_shown or total < self._llm_log_next:
+            self._render_llm_log_page(llm_log, max(0, total - LLM_LOG_PAGE_SIZE))
+        elif total > self._llm_log_next:
+            for i, entry in enumerate(llm_log.get_page(self._llm_log_next, total - self._llm_log_next), start=self._llm_log_next):
+                self._insert_llm_log_entry(i, entry)
+            self._llm_log_next = total
+            while self._llm_log_next - self._llm_log_first > LLM_LOG_PAGE_SIZE:
+                self._drop_llm_log_entry(self._llm_log_first)
+                self._llm_log_first += 1
+        self.llm_log_text.config(state='disabled')
+        if self.llm_log_page_start is None:
+            self.llm_log_text.see(tk.END)
+        self._update_llm_log_label(total)
+
+    def _render_llm_log_page(self, llm_log, start):
+        """Clears the tab and renders one page of collapsed entries starting at start."""
         self.llm_log_text.delete('1.0', tk.END)
+        for index in self._llm_log_visible:
+            self.llm_log_text.tag_delete(f"entry{index}", f"body{index}")
+        self._llm_log_visible.clear()
+        self._llm_log_expanded.clear()
+        entries = llm_log.get_page(start, LLM_LOG_PAGE_SIZE)
+        for i, entry in enumerate(entries, start=start):
+            self._insert_llm_log_entry(i, entry)
+        self._llm_log_shown = llm_log
+        self._llm_log_first = start
+        self._llm_log_next = start + len(entries)
+
+    def _insert_llm_log_entry(self, index, entry):
+        cache_note = f" (cache: {entry['cache']})" if 'cache' in entry else ""
+        header = f"[+] Entry {index+1}: {entry.get('type', 'Unknown')}{cache_note}\n"
+        self.llm_log_text.insert(tk.END, header, ("llm_header", f"entry{index}"))
+        self._llm_log_visible[index] = entry
+
+    def _drop_llm_log_entry(self, index):
+        ranges = self.llm_log_text.tag_ranges(f"entry{index}")
+        if ranges:
+            self.llm_log_text.delete(ranges[0], ranges[-1])
+        self.llm_log_text.tag_delete(f"entry{index}", f"body{index}")
+        self._llm_log_visible.pop(index, None)
+        self._llm_log_expanded.discard(index)
+
+    def _toggle_llm_log_entry(self, event):
+        """Expands or collapses the entry whose header was clicked, rendering its body on demand."""
+        tags = self.llm_log_text.tag_names(f"@{event.x},{event.y}")
+        entry_tags = [tag for tag in tags if tag.startswith("entry")]
+        if not entry_tags:
+            return
+        index = int(entry_tags[0][len("entry"):])
+        entry = self._llm_log_visible.get(index)
+        if entry is None:
+            return
 
-        full_log_text = ""
-        log_entries = self.game_manager.game_state.llm_log
-        for i, entry in enumerate(log_entries):
-            full_log_text += f"--- Entry {i+1}: {entry.get('type', 'Unknown')} ---\n\n"
-            full_log_text += "--- PROMPT SENT TO MODEL ---\n"
-            full_log_text += f"{entry.get('prompt', 'No prompt recorded.')}\n\n"
-            full_log_text += "--- RAW JSON RESPONSE ---\n"
-            response_json = entry.get('response', {})
-            full_log_text += f"{json.dumps(response_json, indent=2)}\n\n"
-            full_log_text += "=" * 50 + "\n\n"
-
-        self.llm_log_text.insert('1.0', full_log_text)
+        header_start = self.llm_log_text.index(f"entry{index}.first")
+        body_start = self.llm_log_text.index(f"{header_start} lineend +1c")
+        self.llm_log_text.config(state='normal')
+        self.llm_log_text.delete(header_start, f"{header_start} +3c")
+        if index in self._llm_log_expanded:
+            body_ranges = self.llm_log_text.tag_ranges(f"body{index}")
+            if body_ranges:
+                self.llm_log_text.delete(body_ranges[0], body_ranges[-1])
+            self._llm_log_expanded.discard(index)
+            self.llm_log_text.insert(header_start, "[+]", ("llm_header", f"entry{index}"))
+        else:
+            body = "--- PROMPT SENT TO MODEL ---\n"
+            body += f"{entry.get('prompt', 'No prompt recorded.')}\n\n"
+            body += "--- RAW JSON RESPONSE ---\n"
+            body += f"{json.dumps(entry.get('response', {}), indent=2)}\n"
+            body += "=" * 50 + "\n"
+            self.llm_log_text.insert(body_start, body, (f"entry{index}", f"body{index}"))
+            self._llm_log_expanded.add(index)
+            self.llm_log_text.insert(header_start, "[-]", ("llm_header", f"entry{index}"))
         self.llm_log_text.config(state='disabled')
-        self.llm_log_text.see(tk.END)
+        return "break"
+
+    def _update_llm_log_label(self, total):
+        if not self._llm_log_visible:
+            self.llm_log_page_label.config(text="No entries")
+            return
+        label = f"Entries {self._llm_log_first + 1}-{self._llm_log_next} of {total}"
+        cache_lookups = [entry['cache'] for entry in self._llm_log_visible.values() if 'cache' in entry]
+        if cache_lookups:
+            hits = sum(1 for tier in cache_lookups if tier != "miss")
+            label += f" | cache hits {hits}/{len(cache_lookups)} ({hits / len(cache_lookups):.0%})"
+        self.llm_log_page_label.config(text=label)
 
     def _get_descriptive_name(self, item, index):
         item_node_name = f"Item {index+1}"
@@ -685,32 +894,81 @@ class DebugWindow(tk.Toplevel):
             elif 'door_ref' in item: item_node_name = f"Exit via {item['door_ref']}"
         return item_node_name
         
-    def _add_node_to_tree(self, parent_node_id, parent_data, data, key_name=""):
-        FLATTENED_LISTS = ['objects', 'actions', 'inventory', 'exits']
+    # Lists whose items are shown directly under the owning node rather than under a node of their own.
+    FLATTENED_LISTS = ['objects', 'actions', 'inventory', 'exits']
 
+    def _env_node_has_children(self, data):
+        """Whether _populate_env_node would add anything under a node for data."""
+        if isinstance(data, dict):
+            return any(isinstance(value, dict) or
+                       (isinstance(value, list) and (key not in self.FLATTENED_LISTS or self._env_node_has_children(value)))
+                       for key, value in data.items())
+        if isinstance(data, list):
+            return any(isinstance(item, (dict, list)) for item in data)
+        return False
+
+    def _add_node_to_tree(self, parent_node_id, parent_data, data, key_name="", index="end"):
+        """
+        Adds a node for data under parent_node_id. Its children are only created
+        when it is first expanded; until then it holds a placeholder so Tk still
+        draws the expand arrow.
+        """
         if isinstance(data, dict):
             node_text = key_name
             if key_name == 'trap': node_text = f"Trap: {data.get('name', 'Unnamed Trap')}"
-            
-            node_id = self.env_tree.insert(parent_node_id, "end", text=node_text, open=False)
-            self.tree_item_map[node_id] = {'data': data, 'parent': parent_data, 'key': key_name}
-            for key, value in data.items():
-                self._add_node_to_tree(node_id, data, value, key_name=key)
-
         elif isinstance(data, list):
-            if key_name in FLATTENED_LISTS:
+            if key_name in self.FLATTENED_LISTS:
                 for i, item in enumerate(data):
                     item_node_name = self._get_descriptive_name(item, i)
                     self._add_node_to_tree(parent_node_id, data, item, key_name=item_node_name)
-            else:
-                node_id = self.env_tree.insert(parent_node_id, "end", text=key_name, open=False)
-                self.tree_item_map[node_id] = {'data': data, 'parent': parent_data, 'key': key_name}
-                for i, item in enumerate(data):
-                    item_node_name = self._get_descriptive_name(item, i)
-                    self._add_node_to_tree(node_id, data, item, key_name=item_node_name)
+                return None
+            node_text = key_name
+        else:
+            return None
+
+        node_id = self.env_tree.insert(parent_node_id, index, text=node_text, open=False)
+        self.tree_item_map[node_id] = {'data': data, 'parent': parent_data, 'key': key_name}
+        if self._env_node_has_children(data):
+            self.env_tree.insert(node_id, "end", text="...")
+            self.env_unpopulated_nodes.add(node_id)
+        return node_id
+
+    def _populate_env_node(self, node_id):
+        """Replaces a node's placeholder with its real children, one level deep."""
+        if node_id not in self.env_unpopulated_nodes:
+            return
+        self.env_unpopulated_nodes.discard(node_id)
+        self.env_tree.delete(*self.env_tree.get_children(node_id))
+        data = self.tree_item_map[node_id]['data']
+        if isinstance(data, dict):
+            for key, value in data.items():
+                self._add_node_to_tree(node_id, data, value, key_name=key)
+        else:
+            for i, item in enumerate(data):
+                item_node_name = self._get_descriptive_name(item, i)
+                self._add_node_to_tree(node_id, data, item, key_name=item_node_name)
+
+    def _on_env_tree_open(self, event=None):
+        self._populate_env_node(self.env_tree.focus())
+
+    def _delete_env_node(self, node_id):
+        """Deletes a node and forgets it and all of its descendants."""
+        stack = [node_id]
+        while stack:
+            current = stack.pop()
+            self.tree_item_map.pop(current, None)
+            self.env_unpopulated_nodes.discard(current)
+            stack.extend(self.env_tree.get_children(current))
+        self.env_tree.delete(node_id)
 
     def _create_environment_tab(self):
         self.tree_item_map, self.selected_env_item, self.env_attribute_widgets = {}, None, {}
+        self.env_unpopulated_nodes = set()
+        # What the tree currently shows: the environment, its two root nodes, and
+        # (section, id) -> (node_id, fingerprint) for every room and door.
+        self._env_shown = None
+        self._env_roots = {}
+        self._env_rendered = {}
         paned_window = tk.PanedWindow(self.tab_environment, orient=tk.HORIZONTAL)
         paned_window.pack(fill=tk.BOTH, expand=True)
 
@@ -721,6 +979,7 @@ class DebugWindow(tk.Toplevel):
         tree_scrollbar.pack(side="right", fill="y")
         self.env_tree.pack(fill="both", expand=True)
         self.env_tree.bind("<<TreeviewSelect>>", self.show_env_details)
+        self.env_tree.bind("<<TreeviewOpen>>", self._on_env_tree_open)
         paned_window.add(left_frame, width=300)
 
         right_frame = Frame(paned_window, bd=2, relief=tk.SUNKEN)
@@ -748,26 +1007,67 @@ class DebugWindow(tk.Toplevel):
         self.refresh_environment_tab()
 
     def refresh_environment_tab(self):
+        """
+        Brings the environment tree in line with the Environment. Rooms and doors
+        whose contents are unchanged keep their nodes; changed ones are redrawn in
+        place, so only what was edited costs anything.
+        """
         if not self.game_manager.turn_order: return
-        for i in self.env_tree.get_children(): self.env_tree.delete(i)
-        self.tree_item_map.clear()
-        
-        for widget in self.env_details_frame.winfo_children(): widget.destroy()
-        self.selected_env_item = None
-        self._update_add_menu()
-
         env = self.game_manager.game_state.environment
-        if hasattr(env, 'rooms') and isinstance(env.rooms, dict):
-            rooms_root = self.env_tree.insert("", "end", text="Rooms", open=True)
-            self.tree_item_map[rooms_root] = {'data': env.rooms, 'parent': env, 'key': 'rooms'}
-            for room_id, room_data in env.rooms.items():
-                self._add_node_to_tree(rooms_root, env.rooms, room_data, key_name=f"{room_id}: {room_data.get('name', '')}")
-
-        if hasattr(env, 'doors') and isinstance(env.doors, dict):
-            doors_root = self.env_tree.insert("", "end", text="Doors", open=False)
-            self.tree_item_map[doors_root] = {'data': env.doors, 'parent': env, 'key': 'doors'}
-            for door_id, door_data in env.doors.items():
-                self._add_node_to_tree(doors_root, env.doors, door_data, key_name=f"{door_id}: {door_data.get('name', '')}")
+        if env is not self._env_shown:
+            for i in self.env_tree.get_children(): self.env_tree.delete(i)
+            self.tree_item_map.clear()
+            self.env_unpopulated_nodes.clear()
+            self._env_roots.clear()
+            self._env_rendered.clear()
+            self._env_shown = env
+
+        for section, label, open_root in (('rooms', "Rooms", True), ('doors', "Doors", False)):
+            entries = getattr(env, section, None)
+            if isinstance(entries, dict):
+                self._sync_env_section(env, section, label, open_root, entries)
+
+        if self.env_tree.selection():
+            self.show_env_details()
+        else:
+            for widget in self.env_details_frame.winfo_children(): widget.destroy()
+            self.selected_env_item = None
+            self._update_add_menu()
+
+    def _sync_env_section(self, env, section, label, open_root, entries):
+        """Diffs one top-level dict (rooms or doors) against the nodes already drawn for it."""
+        root = self._env_roots.get(section)
+        if root is None:
+            root = self._env_roots[section] = self.env_tree.insert("", "end", text=label, open=open_root)
+        self.tree_item_map[root] = {'data': entries, 'parent': env, 'key': section}
+
+        for key in [key for key in self._env_rendered if key[0] == section and key[1] not in entries]:
+            node_id, _ = self._env_rendered.pop(key)
+            self._delete_env_node(node_id)
+
+        for position, (entry_id, entry_data) in enumerate(entries.items()):
+            fingerprint = repr(entry_data)
+            node_id, old_fingerprint = self._env_rendered.get((section, entry_id), (None, None))
+            if node_id is not None and old_fingerprint == fingerprint:
+                if self.env_tree.index(node_id) != position:
+                    self.env_tree.move(node_id, root, position)
+                continue
+
+            was_open = False
+            if node_id is not None:
+                was_open = bool(self.env_tree.item(node_id, 'open'))
+                self._delete_env_node(node_id)
+            node_id = self._add_node_to_tree(root, entries, entry_data,
+                                             key_name=f"{entry_id}: {entry_data.get('name', '')}", index=position)
+            self._env_rendered[(section, entry_id)] = (node_id, fingerprint)
+            if was_open:
+                self._populate_env_node(node_id)
+                self.env_tree.item(node_id, open=True)
+
+    def _on_environment_edited(self):
+        """Re-syncs the lookup indexes and prompt cache after a manual edit, then redraws the tree."""
+        self.game_manager.game_state.rebuild_indexes()
+        self.refresh_environment_tab()
 
     def show_env_details(self, event=None):
         """Displays editable widgets for the selected environment item."""
@@ -847,7 +1147,7 @@ class DebugWindow(tk.Toplevel):
                  return
         
         messagebox.showinfo("Success", "Changes saved successfully.")
-        self.refresh_environment_tab()
+        self._on_environment_edited()
     
     def _get_template(self, template_name, context_data=None):
         if template_name == 'zone':
@@ -869,12 +1169,12 @@ class DebugWindow(tk.Toplevel):
         if not isinstance(parent_dict.get(list_key), list):
             parent_dict[list_key] = []
         parent_dict[list_key].append(template)
-        self.refresh_environment_tab()
+        self._on_environment_edited()
 
     def _add_item_as_dict_key(self, parent_dict, key, template):
         if key not in parent_dict:
             parent_dict[key] = template
-            self.refresh_environment_tab()
+            self._on_environment_edited()
     
     def _update_add_menu(self):
         self.add_menu.delete(0, "end")
@@ -909,14 +1209,14 @@ class DebugWindow(tk.Toplevel):
         while f"new_room_{i}" in rooms: i += 1
         new_id = f"new_room_{i}"
         rooms[new_id] = {"name": "New Room", "room_id": new_id, "zones": []}
-        self.refresh_environment_tab()
+        self._on_environment_edited()
 
     def _add_new_door(self):
         doors, i = self.game_manager.game_state.environment.doors, 1
         while f"new_door_{i}" in doors: i += 1
         new_id = f"new_door_{i}"
         doors[new_id] = {"name": "New Door", "door_id": new_id, "status": "closed", "actions": []}
-        self.refresh_environment_tab()
+        self._on_environment_edited()
 
     def remove_env_item(self):
         if not self.selected_env_item:
@@ -929,12 +1229,13 @@ class DebugWindow(tk.Toplevel):
                 if isinstance(parent, list): parent.remove(data)
                 elif isinstance(parent, dict): del parent[key]
                 else: return messagebox.showerror("Error", "Cannot remove this type of element.")
-                self.refresh_environment_tab()
+                self._on_environment_edited()
             except (ValueError, KeyError):
                 messagebox.showerror("Error", "Could not remove the item.")
-                self.refresh_environment_tab()
+                self._on_environment_edited()
 
 if __name__ == "__main__":
+    from classes import LLMLog
     main_window = tk.Tk()
     class DummyGameManager:
         def __init__(self): 
@@ -948,15 +1249,14 @@ if __name__ == "__main__":
                 party = None
                 game_history = DummyHistory()
                 environment = DummyEnv()
-                llm_log = [
-                    {"type": "Dummy Call", "prompt": "This is a test prompt.", "response": {"result": "ok"}}
-                ]
+                llm_log = LLMLog()
+                llm_log.append({"type": "Dummy Call", "prompt": "This is a test prompt.", "response": {"result": "ok"}})
             self.game_state = DummyState()
 
-        def start_game(self): 
+        def start_game(self, on_token=None): 
             self.turn_order = ["player"]
             return "Dummy game started."
-        def process_player_command(self, cmd): return f"Processed: {cmd}"
+        def process_player_command(self, cmd, on_token=None): return f"Processed: {cmd}"
         def get_initiative_order(self): return "1. player"
 
     app = GameGUI(main_window, DummyGameManager())
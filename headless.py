@@ -0,0 +1,154 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from d6_rules import spawn_seeds
+from game_manager import GameManager, SCENARIO_FILE, INVENTORY_FILE
+from llm_calls import TOOLS
+from llm_stub_server import StubLLMClient, default_responder, melee_responder
+
+# Stub model behaviours, each built from a per-game seed.
+RESPONDERS = {
+    "quiet": lambda seed: default_responder,
+    "melee": melee_responder,
+}
+
+EXPLORE_COMMANDS = [
+    "I look around the room.",
+    "I attack the nearest enemy.",
+    "I search for anything useful.",
+    "I check the door for traps.",
+    "I wait and listen.",
+]
+
+# A policy picks the player's next command: policy(game_manager, player, turn, rng) -> str.
+POLICIES = {
+    "idle": lambda game_manager, player, turn, rng: "I wait and watch.",
+    "explore": lambda game_manager, player, turn, rng: rng.choice(EXPLORE_COMMANDS),
+}
+
+def load_script(path):
+    """Reads player commands from a file, one per line. Blank lines and # comments are skipped."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+
+def script_policy(commands):
+    """A policy that plays the given commands in order, looping."""
+    return lambda game_manager, player, turn, rng: commands[turn % len(commands)]
+
+def run_game(game_index, seed_sequence, options):
+    """
+    Plays one game against the in-process stub model and returns its stats.
+    seed_sequence seeds the game's dice, and the stub model and policy with it.
+    """
+    seed = int(seed_sequence.generate_state(1)[0])
+    rng = random.Random(seed)
+    client = StubLLMClient(RESPONDERS[options["responder"]](seed))
+    if options["script"]:
+        policy = script_policy(options["script"])
+    else:
+        policy = POLICIES[options["policy"]]
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        llm_config = {
+            "url": None,
+            "headers": {},
+            "model": "stub-model",
+            "tools": TOOLS,
+            "client": client,
+            "llm_log_path": os.path.join(temp_dir, "llm_log.jsonl"),
+        }
+        started = time.perf_counter()
+        game_manager = GameManager(llm_config, scenario_file=options["scenario"],
+                                   inventory_file=options["inventory"], seed=seed_sequence)
+        transcript = [game_manager.start_game()]
+
+        turns = 0
+        for turn in range(options["turns"]):
+            if not game_manager.turn_order:
+                break
+            player = game_manager.turn_order[game_manager.current_turn_index]
+            if not player.is_player:
+                break # All-NPC scenario: start_game already played a round.
+            command = policy(game_manager, player, turn, rng)
+            transcript.append(f"> {command}")
+            transcript.append(game_manager.process_player_command(command))
+            turns += 1
+        elapsed = time.perf_counter() - started
+        if options["record"]:
+            # The save and the LLM log written next to it are what replay.py plays the game back from.
+            game_manager.save_game(os.path.join(options["record"], f"game_{game_index}.sav"))
+        game_manager.game_state.llm_log.close()
+
+    text = "\n".join(transcript)
+    return {
+        "game": game_index,
+        "turns": turns,
+        "llm_requests": len(client.requests),
+        "errors": text.count("Error"),
+        "seconds": elapsed,
+        "hp": {actor.name: actor.cur_hp for actor in game_manager.game_state.players + game_manager.game_state.actors},
+        "transcript": text if options["verbose"] else None,
+    }
+
+def run_games(options, games, workers, seed_sequences):
+    """
+    Runs games in a process pool (or inline for one worker) and yields their stats
+    as they finish. Game i plays from seed_sequences[i], whichever worker runs it.
+    """
+    if workers <= 1:
+        for game_index in range(games):
+            yield run_game(game_index, seed_sequences[game_index], options)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(run_game, range(games), seed_sequences, [options] * games)
+
+def main():
+    parser = argparse.ArgumentParser(description="Play games without the GUI against a stub model, for soak tests and throughput.")
+    parser.add_argument("--scenario", default=SCENARIO_FILE)
+    parser.add_argument("--inventory", default=INVENTORY_FILE)
+    parser.add_argument("--games", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--turns", type=int, default=20, help="Player turns per game.")
+    parser.add_argument("--script", help="File of player commands, one per line; overrides --policy.")
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="explore")
+    parser.add_argument("--responder", choices=sorted(RESPONDERS), default="melee")
+    parser.add_argument("--seed", type=int, default=None, help="Makes every game reproducible; omit for fresh entropy.")
+    parser.add_argument("--verbose", action="store_true", help="Print each game's transcript.")
+    parser.add_argument("--record", help="Directory to write each game's save and LLM log to, for replay.py.")
+    args = parser.parse_args()
+
+    options = {
+        "scenario": args.scenario,
+        "inventory": args.inventory,
+        "turns": args.turns,
+        "script": load_script(args.script) if args.script else None,
+        "policy": args.policy,
+        "responder": args.responder,
+        "verbose": args.verbose,
+        "record": args.record,
+    }
+    if args.record:
+        os.makedirs(args.record, exist_ok=True)
+
+    seed_sequences = spawn_seeds(args.seed, args.games)
+    started = time.perf_counter()
+    results = []
+    for result in run_games(options, args.games, max(1, args.workers), seed_sequences):
+        results.append(result)
+        if result["transcript"]:
+            print(f"===== Game {result['game']} =====\n{result['transcript']}\n")
+    wall = time.perf_counter() - started
+
+    turns = sum(r["turns"] for r in results)
+    requests = sum(r["llm_requests"] for r in results)
+    errors = sum(r["errors"] for r in results)
+    print(f"{len(results)} games, {turns} player turns, {requests} LLM requests, {errors} error lines")
+    print(f"{wall:.2f} s wall with {max(1, args.workers)} workers: "
+          f"{len(results) / wall:.1f} games/s, {turns / wall:.1f} turns/s")
+    print(f"Seed entropy {seed_sequences[0].entropy}; game i replays from SeedSequence(entropy, spawn_key=(i,)).")
+
+if __name__ == "__main__":
+    main()
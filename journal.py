@@ -0,0 +1,256 @@
+import json
+import os
+import save_format
+
+def _encode(value) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, sort_keys=True, default=save_format.to_plain)
+
+# Action arguments (see llm_calls.TOOLS) that name another character the action can change.
+ACTOR_ARGUMENTS = ("target", "target_name", "member_name")
+
+# Top-level state entries encode_state encodes item by item.
+LIST_KEYS = ("players", "actors")
+
+def encode_state(state: dict) -> dict:
+    """Encodes each top-level entry (and each item of the list entries) to JSON for cheap comparison."""
+    return {key: [_encode(item) for item in value] if key in LIST_KEYS else _encode(value)
+            for key, value in state.items()}
+
+def autosave_exists(path: str) -> bool:
+    """Whether an autosave snapshot or journal is already on disk at path."""
+    return os.path.exists(path) or os.path.exists(path + ".journal")
+
+def apply_delta(state: dict, delta: dict):
+    """Applies one journal entry's delta (see AutosaveJournal.record) to a decoded save state in place."""
+    if "history" in delta:
+        entries = state["history"]["entries"] + delta["history"]
+        state["history"]["entries"] = entries[-state["history"]["max_entries"]:]
+    for key in ("turn_order", "current_turn_index", "party", "rng"):
+        if key in delta:
+            state[key] = delta[key]
+    for ref, actor_state in delta.get("actors", {}).items():
+        kind, index = ref.split("/")
+        state[kind][int(index)] = actor_state
+    state["objects"]["changed"].update(delta.get("objects", {}))
+    state["doors"]["changed"].update(delta.get("doors", {}))
+
+def read_journal(journal_path: str):
+    """Yields journal entries in order, stopping at a torn final line left by a crash."""
+    with open(journal_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                return
+
+def replay(state: dict, journal_path: str) -> dict:
+    """Applies every journal entry newer than the snapshot to a decoded snapshot state."""
+    snapshot_seq = state.get("journal_seq", 0)
+    for entry in read_journal(journal_path):
+        if entry["seq"] > snapshot_seq:
+            apply_delta(state, entry["delta"])
+            state["journal_seq"] = entry["seq"]
+    return state
+
+class AutosaveJournal:
+    """
+    Autosaves a game as a snapshot (a normal save file at path) plus a write-ahead
+    journal at path + ".journal". Every action and turn appends one line holding
+    only what it changed: new history lines, the turn pointer, the dice state, and
+    the actors, objects and doors it touched. A crash loses at most the action in
+    progress. After snapshot_every records the journal is folded into a fresh
+    snapshot and truncated. GameManager.load_game replays the journal on load.
+
+    Nothing is written until attach(), and attach() won't overwrite an autosave
+    left by an earlier session unless told to, since that may be the only copy of
+    a crashed game.
+    """
+    def __init__(self, path: str, snapshot_every: int = 50, fsync: bool = True):
+        self.path = path
+        self.journal_path = path + ".journal"
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+        self.game_manager = None
+        self.seq = 0
+        self._records_since_snapshot = 0
+        self._file = None
+        self._snapshot_inode = None # Tells our snapshot from one a later session wrote over it.
+
+    def attach(self, game_manager, overwrite: bool = False):
+        """
+        Starts journaling game_manager from a fresh snapshot of its current state.
+        Raises FileExistsError if an autosave is already on disk, unless overwrite.
+        """
+        if not overwrite and autosave_exists(self.path):
+            raise FileExistsError(
+                f"An autosave already exists at {self.path}. Recover it with GameManager.load_game "
+                f"or delete it before autosaving a new game there.")
+        self.game_manager = game_manager
+        self.snapshot()
+
+    def snapshot(self):
+        """Writes the current state as the new snapshot and empties the journal."""
+        state = self.game_manager.capture_state()
+        state["journal_seq"] = self.seq
+        temp_path = self.path + ".tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(save_format.dumps(state))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+        self._snapshot_inode = os.stat(self.path).st_ino
+
+        # Entries written before a crash here are skipped on replay by their seq.
+        if self._file is not None:
+            self._file.close()
+        self._file = open(self.journal_path, 'w', encoding='utf-8')
+        self._records_since_snapshot = 0
+        self._track(state)
+
+    def _track(self, state: dict):
+        """Remembers what the snapshot holds, so records can tell what changed since."""
+        game_state = self.game_manager.game_state
+        env = game_state.environment
+        self._actor_refs = {id(actor): f"players/{i}" for i, actor in enumerate(env.players)}
+        self._actor_refs.update({id(actor): f"actors/{i}" for i, actor in enumerate(env.actors)})
+        self._members = self._membership()
+        self._object_refs = {id(obj): str(i) for i, obj in enumerate(env.initial_objects)}
+        self._sheet_values = {}
+        self._encoded = {f"{kind}/{i}": _encode(actor_state)
+                         for kind in ("players", "actors") for i, actor_state in enumerate(state[kind])}
+        self._encoded.update({f"door/{key}": _encode(door) for key, door in env.doors.items()})
+        self._encoded.update({f"object/{ref}": _encode(env.object_state(obj))
+                              for obj in env.objects for ref in [self._object_refs.get(id(obj))] if ref})
+        for key in ("turn_order", "current_turn_index", "party", "rng"):
+            self._encoded[key] = _encode(state[key])
+        self._history_count = game_state.game_history.count
+        self._world_version = game_state.world_version
+
+    def _membership(self):
+        env = self.game_manager.game_state.environment
+        return ([id(actor) for actor in env.players], [id(actor) for actor in env.actors],
+                [id(obj) for obj in env.objects], list(env.doors))
+
+    def _touched(self, actor, arguments):
+        """The actors, objects and doors an action by actor can have changed."""
+        env = self.game_manager.game_state.environment
+        room_id = actor.location.get('room_id')
+        room = env.get_room_by_id(room_id) or {}
+        zones = [None] + [zone.get('zone') for zone in room.get('zones', [])]
+        actors = [actor] + [other for zone in zones for other in env.get_actors_in_zone(room_id, zone)]
+        objects = [obj for zone in zones for obj in env.get_objects_in_zone(room_id, zone)]
+        arguments = arguments or {}
+        for name in ACTOR_ARGUMENTS:
+            named_actor = self.game_manager.game_state.find_actor_by_name(str(arguments[name])) if arguments.get(name) else None
+            if named_actor is not None:
+                actors.append(named_actor)
+        actors.extend(self.game_manager.game_state.party.members) # move_party moves them all.
+        target = str(arguments.get('target', ''))
+        door = env.get_door_by_name(target) if target else None
+        doors = [key for key, value in env.doors.items() if value is door]
+        return actors, objects, doors
+
+    def _changed(self, key: str, value, delta_section: dict, delta_key: str):
+        encoded = _encode(value)
+        if self._encoded.get(key) != encoded:
+            self._encoded[key] = encoded
+            delta_section[delta_key] = value
+
+    def record(self, kind: str, actor=None, arguments: dict = None, **details):
+        """
+        Appends what changed since the last record, tagged with what caused it.
+        For an action only the actor's surroundings and target are examined, so
+        the cost doesn't grow with the size of the world.
+        """
+        game_state = self.game_manager.game_state
+        env = game_state.environment
+        if self._membership() != self._members:
+            # Actors, objects or doors were added or removed; positions shift, so start afresh.
+            self.seq += 1
+            self.snapshot()
+            return
+
+        delta = {}
+        history = game_state.game_history
+        new_entries = history.count - self._history_count
+        if new_entries:
+            delta["history"] = list(history.history)[-min(new_entries, len(history.history)):]
+            self._history_count = history.count
+
+        turn_order = [self._actor_refs[id(a)].split("/") for a in self.game_manager.turn_order if id(a) in self._actor_refs]
+        turn_order = [[kind, int(index)] for kind, index in turn_order]
+        self._changed("turn_order", turn_order, delta, "turn_order")
+        self._changed("current_turn_index", self.game_manager.current_turn_index, delta, "current_turn_index")
+        self._changed("rng", save_format._rng_state(game_state.rng), delta, "rng")
+        party = game_state.party
+        self._changed("party", {
+            "name": party.name,
+            "members": [[kind, int(index)] for kind, index in
+                        (self._actor_refs[id(m)].split("/") for m in party.members if id(m) in self._actor_refs)],
+            "reputation": party.reputation,
+            "inventory": party.inventory,
+            "active_effects": party.active_effects,
+        }, delta, "party")
+
+        if game_state.world_version != self._world_version:
+            self._world_version = game_state.world_version
+            if actor is not None:
+                actors, objects, doors = self._touched(actor, arguments)
+            else:
+                # A change outside any action (e.g. an editor); check everything.
+                actors, objects, doors = env.players + env.actors, env.objects, list(env.doors)
+            actor_delta, object_delta, door_delta = {}, {}, {}
+            for changed_actor in {id(a): a for a in actors}.values():
+                ref = self._actor_refs[id(changed_actor)]
+                self._changed(ref, save_format._actor_state(changed_actor, env, self._sheet_values), actor_delta, ref)
+            for obj in objects:
+                ref = self._object_refs.get(id(obj))
+                if ref is None:
+                    continue # Added after the scenario loaded; the next snapshot saves it whole.
+                self._changed(f"object/{ref}", env.object_state(obj), object_delta, ref)
+            for key in doors:
+                self._changed(f"door/{key}", env.doors[key], door_delta, key)
+            for name, section in (("actors", actor_delta), ("objects", object_delta), ("doors", door_delta)):
+                if section:
+                    delta[name] = section
+
+        if not delta and kind != "action":
+            return
+
+        self.seq += 1
+        entry = {"seq": self.seq, "kind": kind, **details, "delta": delta}
+        self._file.write(json.dumps(entry, separators=(",", ":"), ensure_ascii=False, default=str) + "\n")
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+        self._records_since_snapshot += 1
+        if self._records_since_snapshot >= self.snapshot_every:
+            self.snapshot()
+
+    def on_action(self, actor, function_name: str, arguments: dict, result):
+        """ActionHandler.after_action callback."""
+        self.record("action", actor=actor, arguments=arguments, actor_name=actor.name,
+                    function=function_name, result=result)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def discard(self):
+        """
+        Closes the journal and deletes the autosave, e.g. once a session ends
+        cleanly. An autosave another game has since taken over is left alone.
+        """
+        self.close()
+        try:
+            if os.stat(self.path).st_ino != self._snapshot_inode:
+                return
+        except OSError:
+            pass
+        for path in (self.path, self.journal_path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,110 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Payload keys that change how a reply is delivered, not what it says.
+TRANSPORT_KEYS = ("stream", "stream_options")
+
+class ResponseCache:
+    """
+    A two-tier cache of chat completion responses: an in-memory LRU in front of
+    an SQLite file. Keys hash everything in the request payload that can change
+    the reply (model, messages, tools, tool_choice and sampling parameters).
+    The disk tier evicts least recently used rows once it grows past max_disk_bytes.
+
+        cache = ResponseCache("llm_cache.sqlite3")
+        response, tier = cache.get(ResponseCache.key(payload))  # tier is "memory", "disk" or None
+    """
+    def __init__(self, path: str = None, memory_entries: int = 256, max_disk_bytes: int = 64 * 1024 * 1024):
+        self.path = path
+        self.memory_entries = memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+            self._db.commit()
+
+    @classmethod
+    def from_config(cls, cache_config):
+        """Builds a cache from llm_config['response_cache']: True for memory only, or a dict of keyword arguments."""
+        if isinstance(cache_config, dict):
+            return cls(**cache_config)
+        return cls()
+
+    @staticmethod
+    def key(payload: dict) -> str:
+        """Returns a stable hash of the parts of a payload that determine the reply."""
+        relevant = {k: v for k, v in payload.items() if k not in TRANSPORT_KEYS}
+        encoded = json.dumps(relevant, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        """Returns (response, tier) on a hit, where tier is "memory" or "disk", or (None, None) on a miss."""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return json.loads(self._memory[key]), "memory"
+            if self._db is None:
+                return None, None
+            row = self._db.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None, None
+            self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+            self._remember(key, row[0])
+            return json.loads(row[0]), "disk"
+
+    def put(self, key: str, response: dict):
+        """Stores a response in both tiers, evicting old entries as needed."""
+        encoded = json.dumps(response, separators=(",", ":"), ensure_ascii=False)
+        with self._lock:
+            self._remember(key, encoded)
+            if self._db is None:
+                return
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, encoded, len(encoded.encode("utf-8")), time.time()),
+            )
+            self._evict_disk()
+            self._db.commit()
+
+    def _remember(self, key, encoded):
+        # Entries are kept encoded so callers can't mutate what the cache hands back.
+        self._memory[key] = encoded
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self):
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_disk_bytes:
+            return
+        for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY last_used").fetchall():
+            if total <= self.max_disk_bytes:
+                break
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+
+    def clear(self):
+        """Empties both tiers."""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
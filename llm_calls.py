@@ -2,77 +2,377 @@ import requests
 import json
 import textwrap
 import copy
+from dataclasses import dataclass
+from typing import Tuple
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from classes import GameState
 from classes import ActionHandler
+from llm_cache import ResponseCache
+from d6_odds import skill_odds
+
+# The function-calling schema offered to the model; keys match ActionHandler.function_map plus "dialogue".
+TOOLS = [
+    {   "type": "function", "function": {
+            "name": "execute_skill_check", "description": "Use a non-magical skill on an object or another character.",
+            "parameters": {"type": "object", "properties": {
+                "skill": {"type": "string", "description": "The name of the skill being used."},
+                "target": {"type": "string", "description": "The target of the skill (an object or character name)."}
+                },
+                "required": ["skill", "target"]
+            }
+        }
+    },
+    {   "type": "function", "function": {
+            "name": "manage_item", "description": "Manage an item. Use for equipping, unequipping, using, moving (giving to another character), creating, or destroying items.",
+            "parameters": {"type": "object", "properties": {
+                "action": {"type": "string", "description": "The action to perform.", "enum": ["equip", "unequip", "use", "move", "create", "destroy"]},
+                "item_name": {"type": "string", "description": "The name of the item."},
+                "quantity": {"type": "integer", "description": "Optional. The number of items. Defaults to 1."},
+                "target_name": {"type": "string", "description": "Optional. The name of the character to move the item to."}
+                },
+                "required": ["action", "item_name"]
+            }
+        }
+    },
+    {   "type": "function", "function": {
+            "name": "manage_party_member", "description": "Add or remove a character from the player's party.",
+            "parameters": {"type": "object", "properties": {
+                "action": {"type": "string", "description": "The action to perform.", "enum": ["add", "remove"]},
+                "member_name": {"type": "string", "description": "The name of the character to add or remove."}
+                },
+                "required": ["action", "member_name"]
+            }
+        }
+    },
+    {   "type": "function", "function": {
+            "name": "move_party", "description": "Move the entire party to an adjacent, connected zone.",
+            "parameters": {"type": "object", "properties": {
+                "destination_zone": {"type": "string", "description": "The name of the zone to move to (must be an exit from the current zone)."}
+                },
+                "required": ["destination_zone"]
+            }
+        }
+    },
+    {   "type": "function", "function": {
+            "name": "dialogue", "description": "Character is primarily speaking",
+            "parameters": {"type": "object", "properties": {
+                "target": {"type": "string", "description": "The item or person being spoken to."}
+                },
+                "required": ["target"]
+            }
+        }
+    }
+]
+
+class LLMClient:
+    """
+    A shared, keep-alive HTTP session for the chat completions endpoint.
+    Connections are pooled and reused across calls, and transient failures
+    (connection errors, 429 and 5xx responses) are retried with backoff.
+    """
+    def __init__(self, url: str, headers: dict = None, pool_size: int = 10,
+                 max_retries: int = 3, backoff_factor: float = 0.5, timeout: float = 30):
+        self.url = url
+        self.timeout = timeout
+
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(["POST"]),
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update(headers or {})
+
+    @classmethod
+    def from_config(cls, llm_config: dict):
+        """
+        Builds a client from an llm_config dict. Besides 'url' and 'headers',
+        the optional keys 'pool_size', 'max_retries', 'retry_backoff' and
+        'timeout' tune the connection pool.
+        """
+        return cls(
+            llm_config['url'],
+            headers=llm_config.get('headers'),
+            pool_size=llm_config.get('pool_size', 10),
+            max_retries=llm_config.get('max_retries', 3),
+            backoff_factor=llm_config.get('retry_backoff', 0.5),
+            timeout=llm_config.get('timeout', 30),
+        )
+
+    def post(self, payload: dict, timeout: float = None) -> dict:
+        """Sends a chat completion request and returns the decoded JSON body."""
+        response = self.session.post(self.url, json=payload, timeout=timeout or self.timeout)
+        return response.json()
+
+    def post_stream(self, payload: dict, on_content, timeout: float = None) -> dict:
+        """
+        Sends a streaming (server-sent events) request. Narrative text is passed to
+        on_content piece by piece as it arrives, and the full reply is returned in
+        the same shape as a non-streaming response.
+        """
+        streaming_payload = dict(payload, stream=True)
+        with self.session.post(self.url, json=streaming_payload, timeout=timeout or self.timeout, stream=True) as response:
+            if not response.headers.get("Content-Type", "").startswith("text/event-stream"):
+                # The server ignored "stream" and answered with a normal JSON body.
+                return response.json()
+            return assemble_stream(response.iter_lines(), on_content)
+
+    def close(self):
+        self.session.close()
+
+def assemble_stream(lines, on_content=None) -> dict:
+    """
+    Rebuilds a chat completion from streamed "data:" lines. Content deltas are
+    concatenated (and forwarded to on_content); tool calls are stitched together
+    from their per-index name and argument fragments.
+    """
+    content_parts = []
+    tool_calls = {}
+    finish_reason = None
+    last_chunk = {}
+
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        if not line.startswith("data:"):
+            continue
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            break
+
+        last_chunk = json.loads(data)
+        choice = (last_chunk.get("choices") or [{}])[0]
+        delta = choice.get("delta") or {}
+
+        if delta.get("content"):
+            content_parts.append(delta["content"])
+            if on_content:
+                on_content(delta["content"])
+
+        for tool_delta in delta.get("tool_calls") or []:
+            tool_call = tool_calls.setdefault(tool_delta.get("index", 0), {
+                "id": None, "type": "function", "function": {"name": "", "arguments": ""}
+            })
+            if tool_delta.get("id"):
+                tool_call["id"] = tool_delta["id"]
+            function_delta = tool_delta.get("function") or {}
+            tool_call["function"]["name"] += function_delta.get("name") or ""
+            tool_call["function"]["arguments"] += function_delta.get("arguments") or ""
+
+        finish_reason = choice.get("finish_reason") or finish_reason
+
+    message = {"role": "assistant", "content": "".join(content_parts)}
+    if tool_calls:
+        message["tool_calls"] = [tool_calls[index] for index in sorted(tool_calls)]
+    return {
+        "id": last_chunk.get("id"),
+        "object": "chat.completion",
+        "model": last_chunk.get("model"),
+        "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+    }
+
+@dataclass(frozen=True)
+class LocationContext:
+    """The prompt fragments that depend only on where an actor stands and the world state."""
+    room_name: str
+    zone_description: str
+    object_names: Tuple[str, ...]
+    actor_names: Tuple[str, ...]
+    door_names: Tuple[str, ...]
+    trap_names: Tuple[str, ...]
+
+def location_context(game_state: GameState, location: dict) -> LocationContext:
+    """
+    Returns the LocationContext for a location, reusing the cached one until
+    game_state.world_version changes. Mutating actions bump that version.
+    """
+    cache = game_state.prompt_cache
+    if cache.get('version') != game_state.world_version:
+        cache.clear()
+        cache['version'] = game_state.world_version
+
+    key = (location['room_id'], location['zone'])
+    context = cache.get(key)
+    if context is None:
+        context = cache[key] = _build_location_context(game_state.environment, *key)
+    return context
+
+def _build_location_context(environment, room_id, zone_id) -> LocationContext:
+    current_room, current_zone_data = environment.get_current_room_data({'room_id': room_id, 'zone': zone_id})
+
+    door_names = []
+    for exit_data in (current_zone_data or {}).get('exits', []):
+        door = environment.get_door_by_id(exit_data.get('door_ref'))
+        if door:
+            door_names.append(door['name'])
+
+    trap = environment.get_trap_in_room(room_id, zone_id)
+    return LocationContext(
+        room_name=current_room['name'] if current_room else 'Unknown Room',
+        zone_description=current_zone_data['description'] if current_zone_data else 'No specific zone description.',
+        object_names=tuple(obj.name for obj in environment.get_objects_in_zone(room_id, zone_id)),
+        actor_names=tuple(a.name for a in environment.get_actors_in_zone(room_id, zone_id)),
+        door_names=tuple(door_names),
+        trap_names=(trap['name'],) if trap else (),
+    )
+
+def _get_client(llm_config: dict) -> LLMClient:
+    """Returns the config's shared client, creating one on first use."""
+    client = llm_config.get('client')
+    if client is None:
+        client = llm_config['client'] = LLMClient.from_config(llm_config)
+    return client
+
+def _get_response_cache(llm_config: dict):
+    """
+    Returns the config's response cache, or None if caching is off. Set
+    llm_config['response_cache'] to True, a dict of ResponseCache arguments,
+    or a ResponseCache to turn it on.
+    """
+    cache = llm_config.get('response_cache')
+    if not cache:
+        return None
+    if not isinstance(cache, ResponseCache):
+        cache = llm_config['response_cache'] = ResponseCache.from_config(cache)
+    return cache
+
+def _cached_response(cache: ResponseCache, payload: dict, on_token=None):
+    """Looks a payload up in the cache, replaying the text to on_token on a hit. Returns (key, response, tier)."""
+    key = ResponseCache.key(payload)
+    response, tier = cache.get(key)
+    if response is not None and on_token:
+        content = response.get("choices", [{}])[0].get("message", {}).get("content")
+        if content:
+            on_token(content)
+    return key, response, tier
+
+def _request(llm_config: dict, prompt: str, payload: dict, on_token=None, cacheable: bool = False):
+    """
+    Sends a request and packages the outcome as {"prompt", "response"} or, on
+    failure, {"prompt", "error"} for the matching apply_* function.
+    If on_token is given and llm_config['stream'] is set, the reply is streamed.
+    If cacheable and a response cache is configured, the result also carries
+    "cache": "memory", "disk" or "miss".
+    """
+    try:
+        cache = _get_response_cache(llm_config) if cacheable else None
+        if cache is not None:
+            key, response, tier = _cached_response(cache, payload, on_token)
+            if response is not None:
+                return {"prompt": prompt, "response": response, "cache": tier}
+
+        client = _get_client(llm_config)
+        if on_token and llm_config.get('stream'):
+            response = client.post_stream(payload, on_token)
+        else:
+            response = client.post(payload)
+
+        if cache is None:
+            return {"prompt": prompt, "response": response}
+        if "choices" in response:
+            cache.put(key, response)
+        return {"prompt": prompt, "response": response, "cache": "miss"}
+    except Exception as e:
+        return {"prompt": prompt, "error": e}
 
 def player_action(input_command: str, actor, game_state: GameState, action_handler: ActionHandler, llm_config: dict):
     """
     Sends the current game state and player command to the AI model.
     If the AI chooses an action, this function uses the ActionHandler to execute it.
     """
-    current_room, current_zone_data = game_state.environment.get_current_room_data(actor.location)
-    
-    objects_in_zone = game_state.environment.get_objects_in_zone(actor.location['room_id'], actor.location['zone'])
-    object_names = [obj.name for obj in objects_in_zone]
-    
-    all_actors = game_state.players + game_state.actors
-    actors_in_room = [a.name for a in all_actors if a.location == actor.location and a.name != actor.name]
-
-    doors_in_room = []
-    if current_zone_data and 'exits' in current_zone_data:
-        for exit_data in current_zone_data['exits']:
-            door_ref = exit_data.get('door_ref')
-            if door_ref:
-                door = game_state.environment.get_door_by_id(door_ref)
-                if door:
-                    doors_in_room.append(door['name'])
-    
-    current_trap = game_state.environment.get_trap_in_room(actor.location['room_id'], actor.location['zone'])
-    
-    prompt_template = textwrap.dedent("""
-    You are an AI assistant for a text-based game. Your task is to determine if a described action requires a mechanical function call.
-
-    Input: '{input_command}'
-
-    **CONTEXT**
-    - Actor Name: {actor_name}
-    - Actor Skills: {actor_skills}
-    - Actors Present: {actors_present}
-    - Objects Present: {objects_present}
-    - Doors Present: {doors_present}
-    - Traps Present: {traps_present}
-    - Recent Game History: {game_history}
-
-    **FUNCTION SELECTION RULES - Follow these steps STRICTLY:**
-    1.  **Analyze the INTENT.** Is the character trying to perform a specific, mechanical action?
-    2.  **Check for SKILL USE.** If the action involves using a skill, you **MUST** call `execute_skill_check`.
-        - The `skill` argument must be a relevant skill from `{actor_skills}`.
-        - The `target` argument must match an item from the lists.
-    3.  **IGNORE DIALOGUE AND FLAVOR TEXT.** If the input is just dialogue, an emotional reaction, or a description of an action without a clear target (e.g., "fiddling with a lockpick," "observing the room," "muttering to himself"), it is NOT a mechanical action. In this case, you **MUST NOT** call any function. Return an empty response.
-    4.  **PRIORITY:** It is better to do nothing than to call a function incorrectly. If you are not certain, do not call a function.
-    """).strip()
-
-    prompt = prompt_template.format(
-        input_command=input_command,
+    prompt, payload = build_player_action_request(input_command, actor, game_state, llm_config)
+    plan = _request(llm_config, prompt, payload, cacheable=True)
+    plan["input"] = input_command
+    return apply_player_action(actor, game_state, action_handler, plan)
+
+# Prompts are laid out as a fixed system message, then a block that only changes
+# per actor, then the per-turn tail. Inference servers that cache KV by prefix
+# (llama.cpp slots, vLLM prefix caching) can then skip re-reading everything up
+# to the first field that actually changed, so keep volatile fields at the end.
+PLAYER_ACTION_SYSTEM_PROMPT = textwrap.dedent("""
+You are an AI assistant for a text-based game. Your task is to determine if a described action requires a mechanical function call.
+
+**FUNCTION SELECTION RULES - Follow these steps STRICTLY:**
+1.  **Analyze the INTENT.** Is the character trying to perform a specific, mechanical action?
+2.  **Check for SKILL USE.** If the action involves using a skill, you **MUST** call `execute_skill_check`.
+    - The `skill` argument must be a relevant skill from the Actor Skills list.
+    - The `target` argument must match an item from the lists.
+3.  **IGNORE DIALOGUE AND FLAVOR TEXT.** If the input is just dialogue, an emotional reaction, or a description of an action without a clear target (e.g., "fiddling with a lockpick," "observing the room," "muttering to himself"), it is NOT a mechanical action. In this case, you **MUST NOT** call any function. Return an empty response.
+4.  **PRIORITY:** It is better to do nothing than to call a function incorrectly. If you are not certain, do not call a function.
+""").strip()
+
+PLAYER_ACTION_ACTOR_TEMPLATE = textwrap.dedent("""
+**ACTOR**
+- Actor Name: {actor_name}
+- Actor Skills: {actor_skills}
+""").strip()
+
+PLAYER_ACTION_TURN_TEMPLATE = textwrap.dedent("""
+**CONTEXT**
+- Actors Present: {actors_present}
+- Objects Present: {objects_present}
+- Doors Present: {doors_present}
+- Traps Present: {traps_present}
+- Recent Game History: {game_history}
+
+Input: '{input_command}'
+""").strip()
+
+def _layered_messages(system_prompt: str, actor_block: str, turn_block: str):
+    """Builds the system / per-actor / per-turn message list shared by every prompt."""
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": f"{actor_block}\n\n{turn_block}"},
+    ]
+
+def _prompt_text(messages) -> str:
+    """Flattens a message list into the single string kept in the LLM log."""
+    return "\n\n".join(f"[{message['role']}]\n{message['content']}" for message in messages)
+
+def build_player_action_request(input_command: str, actor, game_state: GameState, llm_config: dict):
+    """Builds the prompt and request payload for a player action."""
+    context = location_context(game_state, actor.location)
+    actors_in_room = [name for name in context.actor_names if name != actor.name]
+
+    actor_block = PLAYER_ACTION_ACTOR_TEMPLATE.format(
         actor_name=actor.name,
         actor_skills=list(actor.skills.keys()),
+    )
+    turn_block = PLAYER_ACTION_TURN_TEMPLATE.format(
         actors_present=actors_in_room,
-        objects_present=object_names,
-        doors_present=doors_in_room,
-        traps_present=[current_trap['name']] if current_trap else [],
-        game_history=game_state.game_history.get_history_string()
+        objects_present=list(context.object_names),
+        doors_present=list(context.door_names),
+        traps_present=list(context.trap_names),
+        game_history=game_state.game_history.get_history_string(),
+        input_command=input_command,
     )
+    messages = _layered_messages(PLAYER_ACTION_SYSTEM_PROMPT, actor_block, turn_block)
 
     payload = {
         "model": llm_config['model'],
-        "messages": [{"role": "user", "content": prompt}],
+        "messages": messages,
         "tools": llm_config['tools'],
         "tool_choice": "auto"
     }
-        
+    return _prompt_text(messages), payload
+
+def apply_player_action(actor, game_state: GameState, action_handler: ActionHandler, plan: dict):
+    """Logs the model's reply to a player action and executes the function it chose, if any."""
     try:
-        response_json = requests.post(llm_config['url'], headers=llm_config['headers'], json=payload, timeout=30).json()
-        log_entry = {"type": "Player Action", "prompt": prompt, "response": response_json}
+        if "error" in plan:
+            raise plan["error"]
+        response_json = plan["response"]
+        log_entry = {"type": "Player Action", "prompt": plan["prompt"], "response": response_json}
+        if "input" in plan:
+            log_entry["input"] = plan["input"] # The player's command, so replay.py can play the session back.
+        if "cache" in plan:
+            log_entry["cache"] = plan["cache"]
         if hasattr(game_state, 'llm_log'):
             game_state.llm_log.append(log_entry)
             
@@ -91,51 +391,63 @@ def player_action(input_command: str, actor, game_state: GameState, action_handl
         game_state.game_history.add_action(actor.name, mechanical_result)
         return mechanical_result
 
-def narration(actor, game_state: GameState, mechanical_summary: str, llm_config: dict):
+def narration(actor, game_state: GameState, mechanical_summary: str, llm_config: dict, on_token=None):
     """
     Generates a narrative summary of the events that just occurred.
+    on_token, if given, receives the text as it streams in.
     """
-    current_room, current_zone_data = game_state.environment.get_current_room_data(actor.location)
+    prompt, payload = build_narration_request(actor, game_state, mechanical_summary, llm_config)
+    return apply_narration(game_state, _request(llm_config, prompt, payload, on_token, cacheable=True))
 
-    objects_in_zone = game_state.environment.get_objects_in_zone(actor.location['room_id'], actor.location['zone'])
-    object_names = [obj.name for obj in objects_in_zone]
-    
-    all_actors = game_state.players + game_state.actors
-    actors_in_room = [a.name for a in all_actors if a.location == actor.location]
+NARRATION_SYSTEM_PROMPT = textwrap.dedent("""
+You are the narrator of a grounded, text-based RPG. Your job is to describe the outcome of the player's action in a vivid and engaging way, like a good Dungeon Master.
 
-    prompt_template = textwrap.dedent("""
-    You are the narrator of a grounded, text-based RPG. Your job is to describe the outcome of the player's action in a vivid and engaging way, like a good Dungeon Master.
-    
-    **CONTEXT**
-    - Current Room: {room_name} - {zone_description}
-    - Actors Present in this location: {actors_present}
-    - Objects Present in this location: {objects_present}
-    - Recent Game History: {game_history}
-    - **Mechanical Summary:** {mechanical_summary} <-- This is what actually happened. Your narration MUST align perfectly with this result.
-
-    **Your Task:**
-    1.  Write a short (2-3 sentences) narrative description from a third-person perspective focused on {player_name}.
-    2.  Start by briefly describing the character's *attempted action*.
-    3.  Seamlessly weave in the **Mechanical Summary** to describe the final result.
-    4.  Use sensory details (the sound of a lock, the smell of dust, the glint of steel) to immerse the player.
-    5.  Keep the tone grounded and cinematic. Avoid overly dramatic or poetic language.
-    """).strip()
-
-    prompt = prompt_template.format(
-        room_name=current_room['name'] if current_room else 'Unknown Room',
-        zone_description=current_zone_data['description'] if current_zone_data else 'No specific zone description.',
-        actors_present=", ".join(actors_in_room) if actors_in_room else "none",
-        objects_present=", ".join(object_names) if object_names else "none",
-        mechanical_summary=mechanical_summary,
-        player_name=actor.name,
+**Your Task:**
+1.  Write a short (2-3 sentences) narrative description from a third-person perspective focused on the acting character.
+2.  Start by briefly describing the character's *attempted action*.
+3.  Seamlessly weave in the **Mechanical Summary** to describe the final result. The Mechanical Summary is what actually happened; your narration MUST align perfectly with it.
+4.  Use sensory details (the sound of a lock, the smell of dust, the glint of steel) to immerse the player.
+5.  Keep the tone grounded and cinematic. Avoid overly dramatic or poetic language.
+""").strip()
+
+NARRATION_ACTOR_TEMPLATE = "**ACTING CHARACTER**\n- Name: {player_name}"
+
+NARRATION_TURN_TEMPLATE = textwrap.dedent("""
+**CONTEXT**
+- Current Room: {room_name} - {zone_description}
+- Actors Present in this location: {actors_present}
+- Objects Present in this location: {objects_present}
+- Recent Game History: {game_history}
+- **Mechanical Summary:** {mechanical_summary}
+""").strip()
+
+def build_narration_request(actor, game_state: GameState, mechanical_summary: str, llm_config: dict):
+    """Builds the prompt and request payload for a narration."""
+    context = location_context(game_state, actor.location)
+
+    actor_block = NARRATION_ACTOR_TEMPLATE.format(player_name=actor.name)
+    turn_block = NARRATION_TURN_TEMPLATE.format(
+        room_name=context.room_name,
+        zone_description=context.zone_description,
+        actors_present=", ".join(context.actor_names) or "none",
+        objects_present=", ".join(context.object_names) or "none",
         game_history=game_state.game_history.get_history_string(),
+        mechanical_summary=mechanical_summary,
     )
-    
-    payload = {"model": llm_config['model'], "messages": [{"role": "user", "content": prompt}]}
-    
+    messages = _layered_messages(NARRATION_SYSTEM_PROMPT, actor_block, turn_block)
+
+    payload = {"model": llm_config['model'], "messages": messages}
+    return _prompt_text(messages), payload
+
+def apply_narration(game_state: GameState, plan: dict):
+    """Logs a narration reply and returns its text."""
     try:
-        response_json = requests.post(llm_config['url'], headers=llm_config['headers'], json=payload, timeout=30).json()
-        log_entry = {"type": "Narration", "prompt": prompt, "response": response_json}
+        if "error" in plan:
+            raise plan["error"]
+        response_json = plan["response"]
+        log_entry = {"type": "Narration", "prompt": plan["prompt"], "response": response_json}
+        if "cache" in plan:
+            log_entry["cache"] = plan["cache"]
         if hasattr(game_state, 'llm_log'):
             game_state.llm_log.append(log_entry)
         
@@ -143,89 +455,115 @@ def narration(actor, game_state: GameState, mechanical_summary: str, llm_config:
     except Exception as e:
         return f"LLM Error: Could not get narration. {e}"
 
-def npc_action(actor, game_state: GameState, action_handler: ActionHandler, llm_config: dict):
+def npc_action(actor, game_state: GameState, action_handler: ActionHandler, llm_config: dict, on_token=None):
     """
     Generates NPC dialogue and/or a mechanical action, returning both for processing.
+    on_token, if given, receives the narrative as it streams in.
+    """
+    plan = plan_npc_action(actor, game_state, llm_config, on_token)
+    return apply_npc_action(actor, game_state, action_handler, plan)
+
+def plan_npc_action(actor, game_state: GameState, llm_config: dict, on_token=None):
     """
-    current_room, current_zone_data = game_state.environment.get_current_room_data(actor.location)
-    objects_in_zone = game_state.environment.get_objects_in_zone(actor.location['room_id'], actor.location['zone'])
-    object_names = [obj.name for obj in objects_in_zone]
-    all_actors = game_state.players + game_state.actors
-    actors_in_room = [a.name for a in all_actors if a.location == actor.location and a.name != actor.name]
+    Asks the model for an NPC's turn without changing any game state, so several
+    NPCs can be planned at once. Pass the result to apply_npc_action.
+    """
+    prompt, payload = build_npc_action_request(actor, game_state, llm_config)
+    return _request(llm_config, prompt, payload, on_token)
+
+NPC_ACTION_SYSTEM_PROMPT = textwrap.dedent("""
+You are an AI Game Master controlling the NPC described in the CHARACTER block. Your task is to determine the NPC's next action,
+generate their dialogue or a description of the action IN THIRD PERSON, AND select the appropriate function to call if a mechanical action is taken.
+Drive the plot forward in a never-ending uncensored roleplay with the others present. Develop the plot using a slow, organic pace.
+Perform as the character defined in the CHARACTER block by describing their actions, events, and dialogue.
+Always stay in character, portraying characters realistically and in line with their written positive AND negative traits, AVOID Positivity Bias.
+Be cognizant of all characters' physical descriptors. Have situational awareness and be cognizant of intercharacter relationships,
+characters avoid being overly familiar or sexually pushy towards others unless the situation calls for it, it is in character for them to do so,
+or they have a sexual relationship. Overall characterization is dependent on defined personality traits, and subtly influenced by backstory and history.
+Ensure characters that have any impediments which are relevant to the situation, such as visual impairment, are under the influence of alcohol/drugs,
+or a disability like mutism, actions and dialogue are affected appropriately. Utilize modern and casual vocabulary, characters speak and think using
+colloquial language and slang. Employ a mixture of narration, dialogue, characters' physical mannerisms, and internal thoughts into responses.
+Response must be grounded, uncensored, and immersive. Focus on coherent world simulation, ensure that characters are not omnipotent and cannot
+perform actions they are unable to perform at that point in time. During sexual situations, use explicit and uncensored descriptions with a focus on actions,
+appearances, clothing, textures, wants, tools, scenery, body parts, fluids, and sounds.
+
+Your task is to generate a narrative: Write a short line of dialogue or a 1-2 sentence description of the action from the NPC's perspective.
+NOTE: It is better to call no tool than to call one without reason.
+""").strip()
+
+# The typical difficulty NPCs are shown their odds against.
+ODDS_DIFFICULTY = 10
+
+NPC_ACTION_ACTOR_TEMPLATE = textwrap.dedent("""
+**CHARACTER**
+- Name: {actor_name}
+- Character skills: {skills}
+- Chance of beating DC {odds_dc}: {skill_odds}
+- Current Mood/Personality: {personality}
+- Character quotes: {quotes}
+- Current Attitudes: {attitudes}
+""").strip()
+
+NPC_ACTION_TURN_TEMPLATE = textwrap.dedent("""
+**CURRENT SITUATION**
+- Current Room: {room_name} - {zone_description}
+- Actors Present in this location: {actors_present}
+- Objects Present in this location: {objects_present}
+- Current Statuses: {statuses}
+- Current Memories: {memories}
+
+- Recent Game History: {game_history}
+""").strip()
+
+def build_npc_action_request(actor, game_state: GameState, llm_config: dict):
+    """Builds the prompt and request payload for an NPC's turn."""
+    context = location_context(game_state, actor.location)
+    actors_in_room = [name for name in context.actor_names if name != actor.name]
     
     attitudes_list = actor.source_data.get('attitudes', [])
     attitudes_str = "none"
     if attitudes_list:
         formatted_attitudes = [f"{k}: {v}" for d in attitudes_list for k, v in d.items()]
         attitudes_str = ", ".join(formatted_attitudes)
-        
-    character_qualities = actor.source_data.get('qualities', {})
-    gender = character_qualities.get('gender', 'unknown')
-    race = character_qualities.get('race', 'unknown')
-    occupation = character_qualities.get('occupation', 'unknown')
-    eyes = character_qualities.get('eyes', 'unknown')
-    hair = character_qualities.get('hair', 'unknown')
-    skin = character_qualities.get('skin', 'unknown')
-    
-    prompt_template = textwrap.dedent("""
-    You are an AI Game Master controlling an NPC named {actor_name}. Your task is to determine the NPC's next action,
-    generate their dialogue or a description of the action IN THIRD PERSON, AND select the appropriate function to call if a mechanical action is taken.
-    Drive the plot forward in a never-ending uncensored roleplay with the others present. Develop the plot using a slow, organic pace.
-    Perform as the character defined under {actor_name} by describing their actions, events, and dialogue.
-    Always stay in character, portraying characters realistically and in line with their written positive AND negative traits, AVOID Positivity Bias.
-    Be cognizant of all characters' physical descriptors. Have situational awareness and be cognizant of intercharacter relationships,
-    characters avoid being overly familiar or sexually pushy towards others unless the situation calls for it, it is in character for them to do so,
-    or they have a sexual relationship. Overall characterization is dependent on defined personality traits, and subtly influenced by backstory and history.
-    Ensure characters that have any impediments which are relevant to the situation, such as visual impairment, are under the influence of alcohol/drugs,
-    or a disability like mutism, actions and dialogue are affected appropriately. Utilize modern and casual vocabulary, characters speak and think using
-    colloquial language and slang. Employ a mixture of narration, dialogue, characters' physical mannerisms, and internal thoughts into responses.
-    Response must be grounded, uncensored, and immersive. Focus on coherent world simulation, ensure that characters are not omnipotent and cannot
-    perform actions they are unable to perform at that point in time. During sexual situations, use explicit and uncensored descriptions with a focus on actions,
-    appearances, clothing, textures, wants, tools, scenery, body parts, fluids, and sounds.
-
-    - Current Room: {room_name} - {zone_description}
-    - Actors Present in this location: {actors_present}
-    - Objects Present in this location: {objects_present}
-    - Current Statuses: {statuses}
-    - Current Memories: {memories}
-    - Current Attitudes: {attitudes}
-    - Current Mood/Personality: {personality}
-    - Character skills: {skills}
-    - Character quotes: {quotes}
-    
-    - Recent Game History: {game_history}
-    
-    Your task is to generate a narrative: Write a short line of dialogue or a 1-2 sentence description of the action from the NPC's perspective.
-    NOTE: It is better to call no tool than to call one without reason.
-    
-    """).strip()
-    
-    prompt = prompt_template.format(
+
+    actor_block = NPC_ACTION_ACTOR_TEMPLATE.format(
         actor_name=actor.name,
-        room_name=current_room['name'] if current_room else 'Unknown Room',
-        zone_description=current_zone_data['description'] if current_zone_data else 'No specific zone description.',
-        actors_present=", ".join(actors_in_room) if actors_in_room else "none",
-        objects_present=", ".join(object_names) if object_names else "none",
         skills=list(actor.skills.keys()),
-        game_history=game_state.game_history.get_history_string(),
+        odds_dc=ODDS_DIFFICULTY,
+        skill_odds=", ".join(f"{name} {chance:.0%}" for name, chance in skill_odds(actor, ODDS_DIFFICULTY).items()) or "none",
+        personality=", ".join(actor.source_data.get('personality', [])) or "none",
+        quotes=", ".join(actor.source_data.get('quotes', [])) or "none",
+        attitudes=attitudes_str,
+    )
+    turn_block = NPC_ACTION_TURN_TEMPLATE.format(
+        room_name=context.room_name,
+        zone_description=context.zone_description,
+        actors_present=", ".join(actors_in_room) or "none",
+        objects_present=", ".join(context.object_names) or "none",
         statuses=", ".join(actor.source_data.get('statuses', [])) or "none",
         memories=", ".join(actor.source_data.get('memories', [])) or "none",
-        attitudes=attitudes_str,
-        personality=", ".join(actor.source_data.get('personality', [])) or "none",
-        quotes=", ".join(actor.source_data.get('quotes', [])) or "none"
+        game_history=game_state.game_history.get_history_string(),
     )
+    messages = _layered_messages(NPC_ACTION_SYSTEM_PROMPT, actor_block, turn_block)
     
     payload = {
         "model": llm_config['model'],
-        "messages": [{"role": "user", "content": prompt}],
+        "messages": messages,
         "tools": llm_config['tools'],
         "tool_choice": "auto"
     }
-        
+    return _prompt_text(messages), payload
+
+def apply_npc_action(actor, game_state: GameState, action_handler: ActionHandler, plan: dict):
+    """
+    Applies a planned NPC turn: logs the exchange, records dialogue and runs any tool call.
+    """
     try:
-        response_json = requests.post(llm_config['url'], headers=llm_config['headers'], json=payload, timeout=30).json()
-        
-        log_entry = {"type": "NPC Action", "prompt": prompt, "response": response_json}
+        if "error" in plan:
+            raise plan["error"]
+        response_json = plan["response"]
+
+        log_entry = {"type": "NPC Action", "prompt": plan["prompt"], "response": response_json}
         if hasattr(game_state, 'llm_log'):
             game_state.llm_log.append(log_entry)
 
@@ -0,0 +1,235 @@
+import argparse
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+def tool_call_message(function_name: str, arguments: dict, content: str = ""):
+    """Builds an assistant message that calls one tool, in the OpenAI wire format."""
+    return {
+        "role": "assistant",
+        "content": content,
+        "tool_calls": [{
+            "id": f"call_{function_name}",
+            "type": "function",
+            "function": {"name": function_name, "arguments": json.dumps(arguments)},
+        }],
+    }
+
+def default_responder(payload: dict):
+    """Replies with a short line of text and never calls a tool."""
+    return {"role": "assistant", "content": "The stub model nods and waits."}
+
+def scripted_responder(messages):
+    """Returns a responder that plays back the given assistant messages in order, looping."""
+    script = itertools.cycle(messages)
+    lock = threading.Lock()
+    def respond(payload):
+        with lock:
+            return next(script)
+    return respond
+
+def _actors_present(payload: dict):
+    """Pulls the other actors' names out of the context block of a game prompt."""
+    text = payload.get("messages", [{}])[-1].get("content", "")
+    match = re.search(r"^- Actors Present[^:]*: (.*)$", text, re.MULTILINE)
+    if not match or match.group(1) in ("none", "[]"):
+        return []
+    names = match.group(1).strip("[]")
+    return [name.strip(" '\"") for name in names.split(",") if name.strip(" '\"")]
+
+def melee_responder(seed=None):
+    """
+    Returns a responder that plays an aggressive model: whenever tools are on
+    offer and someone else is present, it attacks one of them with melee.
+    Useful for soak-testing the rules without a real model.
+    """
+    rng = random.Random(seed)
+    lock = threading.Lock()
+    def respond(payload):
+        targets = _actors_present(payload) if payload.get("tools") else []
+        if not targets:
+            return default_responder(payload)
+        with lock:
+            target = rng.choice(targets)
+        return tool_call_message("execute_skill_check", {"skill": "melee", "target": target}, f"Attacks {target}.")
+    return respond
+
+def completion_body(payload: dict, message: dict):
+    """Wraps an assistant message in a /v1/chat/completions response body."""
+    return {
+        "id": "chatcmpl-stub",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": payload.get("model", "stub-model"),
+        "choices": [{
+            "index": 0,
+            "message": message,
+            "finish_reason": "tool_calls" if message.get("tool_calls") else "stop",
+        }],
+    }
+
+def completion_chunks(payload: dict, message: dict):
+    """Splits an assistant message into streamed chat.completion.chunk bodies, word by word."""
+    base = {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "model": payload.get("model", "stub-model")}
+    words = (message.get("content") or "").split(" ")
+    for i, word in enumerate(words):
+        text = word if i == 0 else " " + word
+        if text:
+            yield dict(base, choices=[{"index": 0, "delta": {"content": text}, "finish_reason": None}])
+
+    for index, tool_call in enumerate(message.get("tool_calls") or []):
+        arguments = tool_call["function"]["arguments"]
+        half = len(arguments) // 2
+        yield dict(base, choices=[{"index": 0, "finish_reason": None, "delta": {"tool_calls": [{
+            "index": index, "id": tool_call.get("id"), "type": "function",
+            "function": {"name": tool_call["function"]["name"], "arguments": arguments[:half]},
+        }]}}])
+        yield dict(base, choices=[{"index": 0, "finish_reason": None, "delta": {"tool_calls": [{
+            "index": index, "function": {"arguments": arguments[half:]},
+        }]}}])
+
+    finish_reason = "tool_calls" if message.get("tool_calls") else "stop"
+    yield dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": finish_reason}])
+
+class StubLLMClient:
+    """
+    An in-process stand-in for llm_calls.LLMClient: the responder answers every
+    request directly, with no HTTP involved. Put one in llm_config['client'].
+    """
+    def __init__(self, responder=default_responder):
+        self.responder = responder
+        self.requests = []
+
+    def post(self, payload: dict, timeout: float = None) -> dict:
+        self.requests.append(payload)
+        return completion_body(payload, self.responder(payload))
+
+    def post_stream(self, payload: dict, on_content, timeout: float = None) -> dict:
+        response = self.post(payload)
+        content = response["choices"][0]["message"].get("content")
+        if content:
+            on_content(content)
+        return response
+
+    def close(self):
+        pass
+
+class StubLLMServer:
+    """
+    A local stand-in for an OpenAI-style /v1/chat/completions server, for tests
+    and offline runs. Every request payload is recorded in `requests`, and
+    requests with "stream": true get a server-sent event stream back.
+
+        with StubLLMServer(responder=scripted_responder([...])) as server:
+            llm_config = {"url": server.url, "headers": {}, "model": "stub", "tools": TOOLS}
+    """
+    def __init__(self, responder=default_responder, host: str = "127.0.0.1", port: int = 0, delay: float = 0.0):
+        self.responder = responder
+        self.delay = delay
+        self.requests = []
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1/chat/completions"
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                try:
+                    payload = json.loads(self.rfile.read(length) or b"{}")
+                except json.JSONDecodeError:
+                    self._send_json(400, {"error": {"message": "Request body is not valid JSON."}})
+                    return
+
+                with server._lock:
+                    server.requests.append(payload)
+                if server.delay:
+                    time.sleep(server.delay)
+
+                message = server.responder(payload)
+                if payload.get("stream"):
+                    self._send_stream(completion_chunks(payload, message))
+                else:
+                    self._send_json(200, completion_body(payload, message))
+
+            def _send_stream(self, chunks):
+                # No Content-Length for an event stream, so end it by closing the connection.
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+                try:
+                    for chunk in chunks:
+                        self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                        self.wfile.flush()
+                    self.wfile.write(b"data: [DONE]\n\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def _send_json(self, status, body):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                try:
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass # The client gave up (timeout or cancellation) before we replied.
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def serve_forever(self):
+        """Serves on the calling thread until interrupted."""
+        self._httpd.serve_forever()
+
+    def start(self):
+        """Serves on a background thread."""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a stub chat completions server for offline play.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1234)
+    parser.add_argument("--delay", type=float, default=0.0, help="Seconds to wait before each reply.")
+    args = parser.parse_args()
+
+    server = StubLLMServer(host=args.host, port=args.port, delay=args.delay)
+    print(f"Stub LLM listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+import argparse
+import collections
+import datetime
+import json
+import statistics
+import subprocess
+import time
+import numpy as np
+import journal
+import save_format
+from game_manager import GameManager, SCENARIO_FILE, INVENTORY_FILE, llm_log_file
+from llm_calls import TOOLS, _prompt_text
+from llm_stub_server import completion_body, default_responder
+
+HISTORY_FILE = "replay_history.jsonl"
+
+# State entries that don't come from the rules: file paths, autosave bookkeeping.
+UNCOMPARED_KEYS = ("scenario", "inventory", "journal_seq")
+
+def load_log(path):
+    """Reads an LLM log written by LLMLog.export or save_game (or a spill file) as a list of entries."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+class ReplayLLMClient:
+    """
+    An llm_calls.LLMClient stand-in that answers from a recorded LLM log. Each
+    request gets the recorded response whose prompt is identical, so a replay
+    that diverges (a different roll, a changed prompt template) shows up as a
+    miss. Misses fall back to the next unused recorded response so the replay
+    can carry on, and are counted in `misses`.
+    """
+    def __init__(self, entries):
+        self._by_prompt = collections.defaultdict(collections.deque)
+        self._in_order = collections.deque()
+        for index, entry in enumerate(entries):
+            if entry.get("type") in ("Player Action", "NPC Action", "Narration") and "choices" in entry.get("response", {}):
+                self._by_prompt[entry["prompt"]].append(index)
+                self._in_order.append(index)
+        self._entries = entries
+        self._used = set()
+        self.requests = 0
+        self.misses = 0
+        self.seconds = 0.0 # Time spent inside the client, to subtract from the game's timing.
+
+    def post(self, payload: dict, timeout: float = None) -> dict:
+        started = time.perf_counter()
+        self.requests += 1
+        index = self._take(self._by_prompt.get(_prompt_text(payload["messages"])))
+        if index is None:
+            self.misses += 1
+            index = self._take(self._in_order)
+        response = self._entries[index]["response"] if index is not None else completion_body(payload, default_responder(payload))
+        self.seconds += time.perf_counter() - started
+        return response
+
+    def post_stream(self, payload: dict, on_content, timeout: float = None) -> dict:
+        response = self.post(payload)
+        content = response["choices"][0]["message"].get("content")
+        if content:
+            on_content(content)
+        return response
+
+    def _take(self, queue):
+        while queue:
+            index = queue.popleft()
+            if index not in self._used:
+                self._used.add(index)
+                return index
+        return None
+
+    def close(self):
+        pass
+
+def player_commands(entries):
+    """The player's commands in the order they were played, from the Player Action entries."""
+    return [entry["input"] for entry in entries if entry.get("type") == "Player Action" and "input" in entry]
+
+def seed_from_state(state):
+    """The SeedSequence a saved game's dice started from."""
+    rng_state = state["rng"]
+    return np.random.SeedSequence(rng_state["entropy"], spawn_key=rng_state["spawn_key"])
+
+def replay_session(entries, scenario_file=SCENARIO_FILE, inventory_file=INVENTORY_FILE, seed=None):
+    """
+    Plays a recorded session again from the start: same scenario, same dice seed,
+    the recorded player commands, and the recorded model responses. Returns
+    (game_manager, stats), stats holding the timings and the client's counters.
+    """
+    client = ReplayLLMClient(entries)
+    llm_config = {"url": None, "headers": {}, "model": "replay", "tools": TOOLS, "client": client}
+    commands = player_commands(entries)
+
+    started = time.perf_counter()
+    game_manager = GameManager(llm_config, scenario_file=scenario_file, inventory_file=inventory_file, seed=seed)
+    game_manager.start_game()
+    for command in commands:
+        game_manager.process_player_command(command)
+    seconds = time.perf_counter() - started
+    game_manager.game_state.llm_log.close()
+
+    return game_manager, {
+        "turns": len(commands),
+        "llm_requests": client.requests,
+        "misses": client.misses,
+        "seconds": seconds,
+        "engine_seconds": seconds - client.seconds,
+    }
+
+def compare_states(expected, actual):
+    """Returns the names of the top-level state entries that differ between two captured states."""
+    expected = journal.encode_state({k: v for k, v in expected.items() if k not in UNCOMPARED_KEYS})
+    actual = journal.encode_state({k: v for k, v in actual.items() if k not in UNCOMPARED_KEYS})
+    return sorted(key for key in expected.keys() | actual.keys() if expected.get(key) != actual.get(key))
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def append_history(path, record):
+    """Appends one benchmark result to a JSON Lines history file, to track the overhead over time."""
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record) + "\n")
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Replay a recorded session from its LLM log, check the result and time the engine without a network.")
+    parser.add_argument("log", nargs="?", help="LLM log from LLMLog.export (default: the one saved next to --save).")
+    parser.add_argument("--save", help="Save of the session's end state; gives the scenario and seed and is checked against.")
+    parser.add_argument("--scenario", help="Scenario file (default: the save's, else the game's default).")
+    parser.add_argument("--inventory", help="Item file (default: the save's, else the game's default).")
+    parser.add_argument("--seed", type=int, help="Dice seed, for sessions without a save.")
+    parser.add_argument("--runs", type=int, default=5, help="Replays to time; the first also does the check.")
+    parser.add_argument("--history", default=HISTORY_FILE, help="JSON Lines file results are appended to ('' to skip).")
+    args = parser.parse_args()
+    if args.log is None:
+        if not args.save:
+            parser.error("give an LLM log, a --save, or both")
+        args.log = llm_log_file(args.save)
+
+    entries = load_log(args.log)
+    expected, seed = None, args.seed
+    scenario_file, inventory_file = SCENARIO_FILE, INVENTORY_FILE
+    if args.save:
+        with open(args.save, 'rb') as f:
+            expected = save_format.loads(f.read())
+        scenario_file, inventory_file = expected["scenario"]["path"], expected["inventory"]["path"]
+        if seed is None:
+            seed = seed_from_state(expected)
+    scenario_file = args.scenario or scenario_file
+    inventory_file = args.inventory or inventory_file
+    if seed is None:
+        print("Warning: no seed given or saved; dice rolls won't match the recording.")
+
+    runs = []
+    for run in range(max(1, args.runs)):
+        game_manager, stats = replay_session(entries, scenario_file, inventory_file, seed)
+        runs.append(stats)
+        if run == 0:
+            mismatched = compare_states(expected, game_manager.capture_state()) if expected else None
+
+    first = runs[0]
+    engine_ms = statistics.median(r["engine_seconds"] for r in runs) * 1000
+    print(f"{first['turns']} player turns, {first['llm_requests']} LLM requests, "
+          f"{first['misses']} not matched by prompt")
+    if mismatched is None:
+        print("State: not checked (no --save)")
+    elif mismatched:
+        print(f"State: MISMATCH in {', '.join(mismatched)}")
+    else:
+        print("State: matches the save")
+    print(f"Engine time (median of {len(runs)}): {engine_ms:.2f} ms, "
+          f"{engine_ms / max(first['turns'], 1):.3f} ms per player turn, "
+          f"{engine_ms / max(first['llm_requests'], 1):.3f} ms per LLM request")
+
+    if args.history:
+        append_history(args.history, {
+            "time": datetime.datetime.now().isoformat(timespec="seconds"),
+            "revision": _git_revision(),
+            "log": args.log,
+            "turns": first["turns"],
+            "llm_requests": first["llm_requests"],
+            "misses": first["misses"],
+            "state_matches": None if mismatched is None else not mismatched,
+            "engine_ms": round(engine_ms, 3),
+            "ms_per_turn": round(engine_ms / max(first["turns"], 1), 4),
+            "runs": len(runs),
+        })
+
+    raise SystemExit(1 if first["misses"] or mismatched else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+import dataclasses
+import hashlib
+import json
+import os
+import struct
+import zlib
+import numpy as np
+from data_cache import load_yaml_cached
+from classes import Actor, AttributeDict, Environment, GameHistory, GameState, InventoryItem, LLMLog, Object, Party, SkillHandler
+
+# A save file is MAGIC, a big-endian version number, then zlib-compressed JSON.
+MAGIC = b"DMSAVE"
+FORMAT_VERSION = 2
+_HEADER = struct.Struct(">H")
+
+class SaveFormatError(Exception):
+    """Raised when a file is not a save in a format this version understands."""
+
+def is_save_data(data: bytes) -> bool:
+    """Whether data starts with the save header."""
+    return data.startswith(MAGIC)
+
+def dumps(state: dict) -> bytes:
+    body = json.dumps(state, separators=(",", ":"), ensure_ascii=False, default=to_plain)
+    return MAGIC + _HEADER.pack(FORMAT_VERSION) + zlib.compress(body.encode("utf-8"), 6)
+
+def loads(data: bytes) -> dict:
+    if not is_save_data(data):
+        raise SaveFormatError("Not a save file.")
+    (version,) = _HEADER.unpack_from(data, len(MAGIC))
+    if version != FORMAT_VERSION:
+        raise SaveFormatError(f"Save format version {version} is not supported (this game reads {FORMAT_VERSION}).")
+    return json.loads(zlib.decompress(data[len(MAGIC) + _HEADER.size:]).decode("utf-8"))
+
+def to_plain(value):
+    """json.dumps fallback for dataclasses (inventory items, effects) and other odd values."""
+    if dataclasses.is_dataclass(value):
+        return dataclasses.asdict(value)
+    return str(value)
+
+def file_sha256(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+# (path, mtime, size) -> sha256, so autosaving every action doesn't rehash the scenario.
+_file_hashes = {}
+
+def _file_hash(path: str):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    if key not in _file_hashes:
+        _file_hashes[key] = file_sha256(path)
+    return _file_hashes[key]
+
+def _data_file_ref(path: str) -> dict:
+    return {"path": path, "sha256": _file_hash(path)}
+
+def data_file_refs(state: dict) -> list:
+    """Every data file a save depends on, as {"path", "sha256"} refs to check on load."""
+    refs = [state["scenario"], state["inventory"]]
+    refs.extend({"path": path, "sha256": sha256} for path, sha256 in state.get("sheets", {}).items())
+    return refs
+
+def _rng_state(rng: np.random.Generator) -> dict:
+    # The seed the session started from, plus where the stream is now.
+    seed_sequence = rng.bit_generator.seed_seq
+    return {
+        "entropy": seed_sequence.entropy,
+        "spawn_key": list(seed_sequence.spawn_key),
+        "state": rng.bit_generator.state,
+    }
+
+def _restore_rng(state: dict) -> np.random.Generator:
+    rng = np.random.default_rng(np.random.SeedSequence(state["entropy"], spawn_key=state["spawn_key"]))
+    rng.bit_generator.state = state["state"]
+    return rng
+
+# --- Capturing state ---
+
+# Actor fields a save records whenever they differ from the actor's character sheet.
+ACTOR_FIELDS = ("name", "max_hp", "cur_hp", "exp", "attributes", "skills", "inventory",
+                "statuses", "memories", "attitudes", "description", "quotes")
+
+def _inventory_state(inventory) -> list:
+    return [dataclasses.asdict(item) if isinstance(item, InventoryItem) else dataclasses.asdict(InventoryItem(**item))
+            for item in inventory or []]
+
+def _sheet_values(sheet) -> dict:
+    """ACTOR_FIELDS as a freshly spawned actor would have them."""
+    return {
+        "name": sheet.get("name"),
+        "max_hp": sheet.get("max_hp"),
+        "cur_hp": sheet.get("cur_hp"),
+        "exp": sheet.get("exp"),
+        "attributes": dict(sheet.get("attributes") or {}),
+        "skills": dict(sheet.get("skills") or {}),
+        "inventory": _inventory_state(sheet.get("inventory")),
+        "statuses": list(sheet.get("statuses") or []),
+        "memories": list(sheet.get("memories") or []),
+        "attitudes": list(sheet.get("attitudes") or []),
+        "description": sheet.get("description", ""),
+        "quotes": list(sheet.get("quotes") or []),
+    }
+
+def _actor_values(actor: Actor) -> dict:
+    return {
+        "name": actor.name,
+        "max_hp": actor.max_hp,
+        "cur_hp": actor.cur_hp,
+        "exp": actor.exp,
+        "attributes": dict(actor.attributes),
+        "skills": {name: getattr(actor.skills, name).pips for name in actor.skills.keys()},
+        "inventory": _inventory_state(actor.inventory),
+        "statuses": list(actor.source_data.get("statuses") or []),
+        "memories": list(actor.source_data.get("memories") or []),
+        "attitudes": list(actor.source_data.get("attitudes") or []),
+        "description": actor.description,
+        "quotes": list(actor.quotes or []),
+    }
+
+def _actor_state(actor: Actor, env: Environment, sheet_values: dict) -> dict:
+    """An actor's sheet path plus whichever ACTOR_FIELDS have changed from that sheet."""
+    state = {"sheet": actor.sheet_path, "location": actor.location, "is_player": actor.is_player}
+    template = env.get_sheet_template(actor.sheet_path) if actor.sheet_path else None
+    if template is None:
+        # Not spawned from a sheet file (e.g. made in an editor), so the sheet is all there is.
+        state["sheet"] = None
+        state["sheet_data"] = actor.source_data
+        baseline = _sheet_values(actor.source_data)
+    else:
+        if actor.sheet_path not in sheet_values:
+            sheet_values[actor.sheet_path] = _sheet_values(template)
+        baseline = sheet_values[actor.sheet_path]
+    current = _actor_values(actor)
+    state["changed"] = {key: current[key] for key in ACTOR_FIELDS if current[key] != baseline[key]}
+    return state
+
+def _dict_changes(current: dict, initial: dict) -> dict:
+    """Entries of a rooms/doors dict that were added, edited or removed since the scenario was loaded."""
+    return {
+        "changed": {key: value for key, value in current.items() if initial.get(key) != value},
+        "removed": [key for key in initial if key not in current],
+    }
+
+def _scenario_baseline(scenario_file: str):
+    """
+    (rooms, doors, object states) as the scenario file describes them, before any
+    play. Read fresh from the YAML cache at save time, so a game never keeps a
+    second copy of its world around just for saving.
+    """
+    environment = load_yaml_cached(scenario_file).get('environment', {})
+    rooms = {room['room_id']: room for room in environment.get('rooms', [])}
+    doors = {door['door_id']: door for door in environment.get('doors', [])}
+    object_states = [{"location": location, "cur_hp": obj_data.get('hp', 0), "max_hp": obj_data.get('hp', 0),
+                      "is_interactive": obj_data.get('is_interactive', False)}
+                     for obj_data, location in Environment.scenario_objects(rooms)]
+    return rooms, doors, object_states
+
+def _object_changes(env: Environment, initial_states: list) -> dict:
+    """
+    Objects as changes to the scenario's own objects, by their position in
+    Environment.initial_objects, plus any objects added since.
+    """
+    current = {id(obj): obj for obj in env.objects}
+    changed, removed = {}, []
+    for index, (obj, initial) in enumerate(zip(env.initial_objects, initial_states)):
+        if id(obj) not in current:
+            removed.append(index)
+            continue
+        state = env.object_state(obj)
+        if state != initial:
+            changed[str(index)] = state
+    initial_ids = {id(obj) for obj in env.initial_objects}
+    added = [{"name": obj.name, "description": obj.description, "source_data": obj.source_data,
+              **env.object_state(obj)}
+             for obj in env.objects if id(obj) not in initial_ids]
+    return {"changed": changed, "removed": removed, "added": added}
+
+def capture_state(game_manager, scenario_file: str, inventory_file: str) -> dict:
+    """
+    Returns the mutable part of a running game as plain JSON-ready data. Static
+    data (the scenario, the item list, character sheets) is referenced by path
+    and hash, and only what has changed from it is stored, so a save grows with
+    what happened in play rather than with the size of the scenario.
+    """
+    game_state = game_manager.game_state
+    env = game_state.environment
+    refs = {id(actor): ["players", i] for i, actor in enumerate(env.players)}
+    refs.update({id(actor): ["actors", i] for i, actor in enumerate(env.actors)})
+    party = game_state.party
+    sheet_values = {}
+    initial_rooms, initial_doors, initial_objects = _scenario_baseline(scenario_file)
+    players = [_actor_state(actor, env, sheet_values) for actor in env.players]
+    actors = [_actor_state(actor, env, sheet_values) for actor in env.actors]
+    return {
+        "format_version": FORMAT_VERSION,
+        "scenario": _data_file_ref(scenario_file),
+        "inventory": _data_file_ref(inventory_file),
+        "sheets": {path: _file_hash(path) for path in sheet_values},
+        "rooms": _dict_changes(env.rooms, initial_rooms),
+        "doors": _dict_changes(env.doors, initial_doors),
+        "objects": _object_changes(env, initial_objects),
+        "players": players,
+        "actors": actors,
+        "party": {
+            "name": party.name,
+            "members": [refs[id(member)] for member in party.members if id(member) in refs],
+            "reputation": party.reputation,
+            "inventory": party.inventory,
+            "active_effects": party.active_effects,
+        },
+        "history": {
+            "max_entries": game_state.game_history.history.maxlen,
+            "entries": list(game_state.game_history.history),
+        },
+        "turn_order": [refs[id(actor)] for actor in game_manager.turn_order if id(actor) in refs],
+        "current_turn_index": game_manager.current_turn_index,
+        "rng": _rng_state(game_state.rng),
+    }
+
+# --- Restoring state ---
+
+def _apply_actor_changes(actor: Actor, changed: dict):
+    for key, value in changed.items():
+        if key == "attributes":
+            actor.attributes = AttributeDict(value)
+        elif key == "skills":
+            actor.source_data["skills"] = dict(value)
+            actor.skills = SkillHandler(actor)
+        elif key == "inventory":
+            actor.inventory = [InventoryItem(**item) for item in value]
+        elif key in ("statuses", "memories", "attitudes"):
+            # Prompts read these from the sheet, so the actor and its sheet share one list.
+            actor.source_data[key] = list(value)
+            setattr(actor, key, actor.source_data[key])
+        else:
+            setattr(actor, key, value)
+
+def _restore_actor(env: Environment, state: dict) -> Actor:
+    if state["sheet"] is not None:
+        actor = env._spawn_actor({"sheet": state["sheet"], "location": state["location"]})
+        if actor is None:
+            raise SaveFormatError(f"Character sheet {state['sheet']} could not be loaded.")
+    else:
+        sheet = state["sheet_data"]
+        constructor_args = sheet.copy()
+        constructor_args.pop('skills', None)
+        actor = Actor(**constructor_args, location=dict(state["location"]), source_data=sheet)
+    actor.is_player = state["is_player"]
+    _apply_actor_changes(actor, state["changed"])
+    return actor
+
+def _restore_environment(game_manager, state: dict) -> Environment:
+    """Loads the scenario afresh, then applies the saved changes to it."""
+    env = Environment(game_manager.scenario_data, game_manager.all_items, [], [], game_manager._load_character_sheet)
+
+    for current, changes in ((env.rooms, state["rooms"]), (env.doors, state["doors"])):
+        for key in changes["removed"]:
+            current.pop(key, None)
+        current.update(changes["changed"])
+
+    scenario_objects = env.initial_objects
+    for index, saved in state["objects"]["changed"].items():
+        obj = scenario_objects[int(index)]
+        obj.location, obj.cur_hp, obj.max_hp, obj.is_interactive = (
+            saved["location"], saved["cur_hp"], saved["max_hp"], saved["is_interactive"])
+    removed = {int(index) for index in state["objects"]["removed"]}
+    env.objects = [obj for index, obj in enumerate(scenario_objects) if index not in removed]
+    for saved in state["objects"]["added"]:
+        env.objects.append(Object(name=saved["name"], description=saved["description"], location=saved["location"],
+                                  source_data=saved["source_data"], is_interactive=saved["is_interactive"],
+                                  max_hp=saved["max_hp"], cur_hp=saved["cur_hp"]))
+
+    env.players = [_restore_actor(env, actor_state) for actor_state in state["players"]]
+    env.actors = [_restore_actor(env, actor_state) for actor_state in state["actors"]]
+    return env
+
+def restore_state(game_manager, state: dict, llm_log: LLMLog = None):
+    """
+    Rebuilds game_manager.game_state, turn order and text log from captured state.
+    game_manager must already have its scenario_data and all_items loaded.
+    """
+    environment = _restore_environment(game_manager, state)
+    environment.rebuild_index()
+    lookup = {"players": environment.players, "actors": environment.actors}
+
+    party_state = state["party"]
+    party = Party(party_state["name"])
+    for kind, index in party_state["members"]:
+        party.add_member(lookup[kind][index])
+    party.reputation = party_state["reputation"]
+    party.inventory = party_state["inventory"]
+    party.active_effects = party_state["active_effects"]
+
+    game_history = GameHistory(max_entries=state["history"]["max_entries"])
+    game_history.history.extend(state["history"]["entries"])
+
+    game_manager.game_state = GameState(
+        environment=environment,
+        party=party,
+        game_history=game_history,
+        players=environment.players,
+        actors=environment.actors,
+        llm_log=llm_log if llm_log is not None else LLMLog(),
+        rng=_restore_rng(state["rng"]),
+    )
+    game_manager.turn_order = [lookup[kind][index] for kind, index in state["turn_order"]]
+    game_manager.current_turn_index = state["current_turn_index"]
+    game_manager.gui_text_log = ""
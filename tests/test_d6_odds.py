@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+from d6_odds import success_probability, opposed_probability
+from d6_rules import roll_d6_check, roll_d6_dice_many
+
+def test_success_probability_accepts_floats():
+    assert success_probability(3.0, 2) == success_probability(3, 2)
+    assert success_probability(3, 2.0) == success_probability(3, 2)
+    assert success_probability(7.0, 9.0, 2.0) == success_probability(7, 9, 2)
+
+def test_success_probability_fractional_dc_rounds_up():
+    assert success_probability(6, 7.5) == success_probability(6, 8)
+
+def test_opposed_probability_accepts_floats():
+    assert opposed_probability(9.0, 6.0, 7) == opposed_probability(9, 6, 7)
+    assert opposed_probability(4.0) == opposed_probability(4)
+
+@pytest.mark.parametrize("pips, dc", [(0, 1), (3, 4), (7, 12), (14, 20)])
+def test_success_probability_matches_rolls(pips, dc):
+    rng = np.random.default_rng(pips * 100 + dc)
+    rolls = 40000
+    wins = sum(roll_d6_check(pips, dc, rng=rng)[1] for _ in range(rolls))
+    assert wins / rolls == pytest.approx(success_probability(pips, dc), abs=0.015)
+
+def test_opposed_probability_matches_rolls():
+    rng = np.random.default_rng(7)
+    rolls = 40000
+    attack = roll_d6_dice_many(np.full(rolls, 10), rng)
+    dodge = roll_d6_dice_many(np.full(rolls, 8), rng)
+    parry = roll_d6_dice_many(np.full(rolls, 9), rng)
+    wins = np.mean(attack > np.maximum(dodge, parry))
+    assert wins == pytest.approx(opposed_probability(10, 8, 9), abs=0.015)
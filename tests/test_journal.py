@@ -0,0 +1,71 @@
+import journal
+import replay
+from game_manager import GameManager
+from llm_calls import TOOLS
+from llm_stub_server import StubLLMClient
+
+SCENARIO = """\
+scenario_name: Two Rooms
+players:
+  - sheet: d6_warrior.yaml
+    location: {room_id: room_1, zone: 1}
+actors:
+  - sheet: d6_rogue.yaml
+    location: {room_id: room_1, zone: 1}
+environment:
+  rooms:
+    - name: Hall
+      room_id: room_1
+      zones:
+        - zone: 1
+          description: A hall.
+    - name: Cellar
+      room_id: room_2
+      zones:
+        - zone: 1
+          description: A cellar.
+"""
+
+def _llm_config(autosave_path):
+    return {"url": None, "headers": {}, "model": "stub-model", "tools": TOOLS, "client": StubLLMClient(),
+            "autosave_path": autosave_path, "autosave_snapshot_every": 1000}
+
+def test_recovery_keeps_an_item_given_to_another_room(tmp_path):
+    scenario_file = tmp_path / "two_rooms.yaml"
+    scenario_file.write_text(SCENARIO, encoding='utf-8')
+    autosave_path = str(tmp_path / "autosave.sav")
+    game_manager = GameManager(_llm_config(autosave_path), scenario_file=str(scenario_file), seed=3)
+    game_manager.start_game()
+
+    giver = game_manager.game_state.find_actor_by_name("Valerius")
+    receiver = game_manager.game_state.find_actor_by_name("Kael")
+    game_manager.game_state.environment.move_actor(receiver, {"room_id": "room_2", "zone": 1})
+    game_manager.game_state.bump_world_version()
+    handler = game_manager.action_handler
+    handler.execute_action(giver, "manage_item", {"action": "create", "item_name": "longsword"})
+    handler.execute_action(giver, "manage_item", {"action": "move", "item_name": "longsword", "target_name": "Kael"})
+    assert any(item.item == "longsword" for item in receiver.inventory)
+
+    # The game is never closed, as in a crash; only the snapshot and journal are left.
+    recovered = GameManager.load_game(autosave_path, _llm_config(None))
+    assert replay.compare_states(game_manager.capture_state(), recovered.capture_state()) == []
+    recovered_receiver = recovered.game_state.find_actor_by_name("Kael")
+    assert recovered_receiver.location["room_id"] == "room_2"
+    assert any(item.item == "longsword" for item in recovered_receiver.inventory)
+    game_manager.autosave.close()
+
+def test_closing_a_game_leaves_an_autosave_another_game_took_over(tmp_path):
+    scenario_file = tmp_path / "two_rooms.yaml"
+    scenario_file.write_text(SCENARIO, encoding='utf-8')
+    autosave_path = str(tmp_path / "autosave.sav")
+    game_manager = GameManager(_llm_config(autosave_path), scenario_file=str(scenario_file), seed=3)
+    game_manager.start_game()
+
+    # As the GUI does when the player loads the autosave: load it, then close the old game.
+    recovered = GameManager.load_game(autosave_path, _llm_config(autosave_path))
+    game_manager.close()
+    assert recovered.autosave is not None
+    assert journal.autosave_exists(autosave_path)
+
+    recovered.close()
+    assert not journal.autosave_exists(autosave_path)
@@ -0,0 +1,70 @@
+import pytest
+import replay
+import save_format
+from game_manager import GameManager, llm_log_file
+from llm_calls import TOOLS
+from llm_stub_server import StubLLMClient, melee_responder
+
+# Has NPCs, so the log holds their turns as well as the player's.
+SCENARIO_FILE = "scenario.yaml"
+COMMANDS = ["I look around.", "I attack the nearest enemy.", "I wait and watch.", "I attack again."]
+
+def _llm_config(seed):
+    return {"url": None, "headers": {}, "model": "stub-model", "tools": TOOLS,
+            "client": StubLLMClient(melee_responder(seed))}
+
+def _replay_save(path):
+    """Replays a save from the LLM log save_game wrote next to it; returns (mismatched keys, stats)."""
+    with open(path, 'rb') as f:
+        expected = save_format.loads(f.read())
+    entries = replay.load_log(llm_log_file(path))
+    game_manager, stats = replay.replay_session(entries, expected["scenario"]["path"], expected["inventory"]["path"],
+                                                replay.seed_from_state(expected))
+    return replay.compare_states(expected, game_manager.capture_state()), stats
+
+@pytest.fixture
+def played_game():
+    game_manager = GameManager(_llm_config(1), scenario_file=SCENARIO_FILE, seed=11)
+    game_manager.start_game()
+    for command in COMMANDS:
+        game_manager.process_player_command(command)
+    yield game_manager
+    game_manager.game_state.llm_log.close()
+
+def test_save_game_writes_a_replayable_log(played_game, tmp_path):
+    path = str(tmp_path / "game.sav")
+    assert played_game.save_game(path)
+
+    mismatched, stats = _replay_save(path)
+    assert mismatched == []
+    assert stats["turns"] == len(COMMANDS)
+    assert stats["llm_requests"] > stats["turns"]
+    assert stats["misses"] == 0
+
+def test_saving_again_appends_only_new_log_entries(played_game, tmp_path):
+    path = str(tmp_path / "game.sav")
+    assert played_game.save_game(path)
+    with open(llm_log_file(path), 'rb') as f:
+        first_save = f.read()
+    played_game.process_player_command(COMMANDS[0])
+    assert played_game.save_game(path)
+    with open(llm_log_file(path), 'rb') as f:
+        second_save = f.read()
+    assert second_save.startswith(first_save)
+    assert len(second_save.splitlines()) == len(played_game.game_state.llm_log)
+
+@pytest.mark.parametrize("second_name", ["first.sav", "second.sav"])
+def test_loaded_and_continued_game_replays_from_the_start(played_game, tmp_path, second_name):
+    first = str(tmp_path / "first.sav")
+    assert played_game.save_game(first)
+    loaded = GameManager.load_game(first, _llm_config(2))
+    for command in COMMANDS:
+        loaded.process_player_command(command)
+    second = str(tmp_path / second_name)
+    assert loaded.save_game(second)
+    loaded.game_state.llm_log.close()
+
+    mismatched, stats = _replay_save(second)
+    assert mismatched == []
+    assert stats["turns"] == 2 * len(COMMANDS)
+    assert stats["misses"] == 0
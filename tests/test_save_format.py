@@ -0,0 +1,26 @@
+import pickle
+import pytest
+import save_format
+from game_manager import GameManager
+
+def test_loads_refuses_anything_but_the_current_format():
+    with pytest.raises(save_format.SaveFormatError):
+        save_format.loads(pickle.dumps({"rooms": []}))
+    old_version = save_format.MAGIC + save_format._HEADER.pack(1) + b"x"
+    with pytest.raises(save_format.SaveFormatError):
+        save_format.loads(old_version)
+
+def test_load_game_does_not_unpickle(tmp_path):
+    path = tmp_path / "game.sav"
+    path.write_bytes(pickle.dumps({"rooms": []}))
+    assert GameManager.load_game(str(path)) is None
+
+def test_gui_text_log_is_kept_out_of_the_save(tmp_path):
+    game_manager = GameManager({"url": None, "headers": {}, "model": "m", "tools": []}, seed=1)
+    game_manager.gui_text_log = "You enter the training grounds.\n"
+    path = str(tmp_path / "game.sav")
+    assert game_manager.save_game(path)
+    with open(path, 'rb') as f:
+        assert "gui_text_log" not in save_format.loads(f.read())
+    assert GameManager.load_game(path).gui_text_log == game_manager.gui_text_log
+    game_manager.game_state.llm_log.close()